@@ -9,6 +9,7 @@ from .models import (
     Region,
     Booking,
     Available,
+    DailyOccupancy,
     Invoice,
     InvoiceStatus,
     SleepingSpace,
@@ -108,6 +109,13 @@ class AvailableAdmin(admin.ModelAdmin):
     search_fields = ("available_date",)
 
 
+@admin.register(DailyOccupancy)
+class DailyOccupancyAdmin(admin.ModelAdmin):
+    list_filter = ("host", "date")
+    list_display = ("date", "product", "occupied", "arrivals", "departures", "no_shows")
+    ordering = ("date",)
+
+
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
     list_display = ('id', 'host', 'amount', 'vat', 'vat_rate', 'created_at', 'due_date', 'status', 'currency', 'invoice_number')
@@ -1,11 +1,109 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from ninja.responses import JsonResponse
 
+# Grupper och härbärgen per användare cachas mellan anrop och rensas via
+# signaler när de ändras, se backend/signals.py. Cachen måste delas av alla processer
+# (CACHES i settings), annars rensas den bara i processen som gjorde ändringen.
+USER_CACHE_TIMEOUT = 60 * 60
+USER_CACHES = ["user_groups", "host_ids", "caseworker_host_ids"]
+
+
+def user_cache_key(name, user_id):
+    return f"{name}:{user_id}"
+
+
+def memoize_on_user(user, name, compute):
+    """
+    compute() för användaren, sparas på user-objektet för resten av anropet.
+    """
+    attr = f"_{name}"
+    if not hasattr(user, attr):
+        setattr(user, attr, compute())
+    return getattr(user, attr)
+
+
+def cached_for_user(user, name, compute):
+    """
+    compute() för användaren, sparas på user-objektet för resten av anropet
+    och i cachen för kommande anrop.
+    """
+    def compute_cached():
+        key = user_cache_key(name, user.pk)
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, USER_CACHE_TIMEOUT)
+        return value
+    return memoize_on_user(user, name, compute_cached)
+
+
+def prefetch_user_cache(user, names):
+    """
+    Hämta flera cachade värden för användaren i ett anrop till cachen,
+    t.ex. grupper och härbärgen i host_auth.
+    """
+    names = [name for name in names if not hasattr(user, f"_{name}")]
+    cached = cache.get_many([user_cache_key(name, user.pk) for name in names])
+    for name in names:
+        value = cached.get(user_cache_key(name, user.pk))
+        if value is not None:
+            setattr(user, f"_{name}", value)
+
+
+def clear_user_cache(user_ids, names=USER_CACHES):
+    cache.delete_many([user_cache_key(name, user_id) for user_id in user_ids for name in names])
+
+
+def user_group_names(user):
+    """
+    Namnen på användarens grupper, sorterade
+    """
+    return cached_for_user(
+        user, "user_groups", lambda: sorted(user.groups.values_list("name", flat=True)))
+
+
+def user_host_ids(user):
+    """
+    Id för härbärgen där användaren är värd (Host.users)
+    """
+    return cached_for_user(
+        user, "host_ids", lambda: sorted(user.host_set.values_list("id", flat=True)))
+
+
+def user_caseworker_host_ids(user):
+    """
+    Id för härbärgen där användaren är handläggare (Host.caseworkers)
+    """
+    return cached_for_user(
+        user, "caseworker_host_ids", lambda: sorted(user.caseworker_hosts.values_list("id", flat=True)))
+
+
 def group_auth(request, group): #Kolla så att användaren tillhör rätt grupp
     if not request.user.is_authenticated:
         return False
-    
-    if not request.user.groups.filter(name=group).exists():
+
+    if group not in user_group_names(request.user):
+        return False
+
+    return True
+
+
+def host_auth(request):
+    # Värdens härbärgen sätts på request.host_ids
+    if request.user.is_authenticated:
+        prefetch_user_cache(request.user, ["user_groups", "host_ids"])
+    if not group_auth(request, "host"):
+        return False
+    request.host_ids = user_host_ids(request.user)
+    return True
+
+
+def caseworker_auth(request):
+    # Handläggarens härbärgen sätts på request.caseworker_host_ids
+    if request.user.is_authenticated:
+        prefetch_user_cache(request.user, ["user_groups", "caseworker_host_ids"])
+    if not group_auth(request, "caseworker"):
         return False
-    
-    return True
\ No newline at end of file
+    request.caseworker_host_ids = user_caseworker_host_ids(request.user)
+    return True
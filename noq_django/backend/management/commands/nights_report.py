@@ -0,0 +1,51 @@
+"""
+Django command to report the number of nights stayed per region, host or guest.
+"""
+import csv
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from backend.models import Booking, State
+
+GROUPS = {
+    "region": ["product__host__region__name"],
+    "host": ["product__host__region__name", "product__host__name"],
+    "user": ["product__host__region__name", "user_id", "user__first_name", "user__last_name"],
+}
+
+
+class Command(BaseCommand):
+    """
+    Django command to sum nights stayed during a period as CSV.
+
+    Bookings are clipped to the period and summed in the database, so the
+    period may span years of bookings.
+    """
+    help = "Report nights stayed (checked in or completed) per region, host or user as CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("start_date", type=str, help="First night (YYYY-MM-DD)")
+        parser.add_argument("end_date", type=str, help="Last night (YYYY-MM-DD)")
+        parser.add_argument(
+            "--group-by", choices=GROUPS.keys(), default="host",
+            help="Sum the nights per region, host or user, default host",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Entrypoint for command.
+        """
+        date_field = Booking._meta.get_field("start_date")
+        start_date = date_field.to_python(options["start_date"])
+        end_date = date_field.to_python(options["end_date"]) + timedelta(days=1)
+        if end_date <= start_date:
+            raise CommandError("end_date must not be before start_date")
+
+        fields = GROUPS[options["group_by"]]
+        rows = Booking.objects.filter(
+            status_id__in=[State.CHECKED_IN, State.COMPLETED]
+        ).nights_per(start_date, end_date, *fields)
+
+        writer = csv.writer(self.stdout)
+        writer.writerow(fields + ["nights"])
+        for row in rows:
+            writer.writerow([row[field] for field in fields] + [row["total_nights"].days])
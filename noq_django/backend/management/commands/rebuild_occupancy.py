@@ -0,0 +1,61 @@
+"""
+Django command to rebuild the daily occupancy statistics from the bookings.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from backend.models import Product, Booking, DailyOccupancy
+
+
+class Command(BaseCommand):
+    """
+    Django command to rebuild DailyOccupancy from the bookings.
+
+    DailyOccupancy is normally updated incrementally when bookings change,
+    this command fills it from the booking history or repairs any drift.
+    """
+    help = "Rebuild DailyOccupancy from the bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product", type=int, action="append", dest="product_ids",
+            help="Only rebuild this product, can be given several times",
+        )
+        parser.add_argument(
+            "--start-date", type=str,
+            help="First date to rebuild (YYYY-MM-DD), default first booked date",
+        )
+        parser.add_argument(
+            "--end-date", type=str,
+            help="Last date to rebuild (YYYY-MM-DD), default last booked date",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Entrypoint for command.
+        """
+        date_field = DailyOccupancy._meta.get_field("date")
+        start_date = date_field.to_python(options["start_date"])
+        end_date = date_field.to_python(options["end_date"])
+
+        products = Product.objects.all()
+        if options["product_ids"]:
+            products = products.filter(id__in=options["product_ids"])
+
+        for product in products:
+            booked = Booking.objects.filter(product=product).aggregate(
+                first=Min("start_date"), last=Max("end_date"))
+            product_start_date = start_date or booked["first"]
+            # Departures are counted on end_date, so it is included
+            product_end_date = end_date + timedelta(days=1) if end_date else (
+                booked["last"] + timedelta(days=1) if booked["last"] else None)
+            if not product_start_date or not product_end_date or product_end_date <= product_start_date:
+                continue
+
+            DailyOccupancy.objects.rebuild(product, product_start_date, product_end_date)
+            self.stdout.write(
+                f"{product.name} (id {product.id}): "
+                f"{product_start_date} - {product_end_date - timedelta(days=1)}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("DailyOccupancy rebuilt."))
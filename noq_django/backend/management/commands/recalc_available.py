@@ -0,0 +1,72 @@
+"""
+Django command to recount available places from the bookings.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from backend.models import Product, Booking, Available
+
+
+class Command(BaseCommand):
+    """
+    Django command to reconcile Available with the bookings.
+
+    Available is normally updated incrementally when bookings change,
+    this command does a full recount to repair any drift.
+    """
+    help = "Recount places_left in Available from the bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product", type=int, action="append", dest="product_ids",
+            help="Only recount this product, can be given several times",
+        )
+        parser.add_argument(
+            "--start-date", type=str,
+            help="First date to recount (YYYY-MM-DD), default today",
+        )
+        parser.add_argument(
+            "--end-date", type=str,
+            help="Last date to recount (YYYY-MM-DD), default last booked date",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Entrypoint for command.
+        """
+        date_field = Available._meta.get_field("available_date")
+        start_date = date_field.to_python(options["start_date"]) or timezone.now().date()
+        end_date = date_field.to_python(options["end_date"])
+
+        products = Product.objects.all()
+        if options["product_ids"]:
+            products = products.filter(id__in=options["product_ids"])
+
+        for product in products:
+            if end_date:
+                product_end_date = end_date + timedelta(days=1)
+            else:
+                # Recount up to the last date that has a booking or an Available
+                last_booked = Booking.objects.occupying().filter(
+                    product=product).aggregate(last=Max("end_date"))["last"]
+                last_available = Available.objects.filter(
+                    product=product).aggregate(last=Max("available_date"))["last"]
+                last_dates = [d for d in [
+                    last_booked,
+                    last_available + timedelta(days=1) if last_available else None,
+                ] if d]
+                if not last_dates:
+                    continue
+                product_end_date = max(last_dates)
+
+            if product_end_date <= start_date:
+                continue
+
+            Available.objects.recalc(product, start_date, product_end_date)
+            self.stdout.write(
+                f"{product.name} (id {product.id}): "
+                f"{start_date} - {product_end_date - timedelta(days=1)}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Available recounted."))
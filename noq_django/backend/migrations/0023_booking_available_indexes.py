@@ -0,0 +1,47 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:43
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_available(apps, schema_editor):
+    # Keep one Available per product and date so the unique constraint
+    # can be added. Run recalc_available afterwards to recount them.
+    Available = apps.get_model('backend', 'Available')
+    duplicates = (
+        Available.objects.values('product_id', 'available_date')
+        .annotate(count=Count('id'), keep_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        Available.objects.filter(
+            product_id=duplicate['product_id'],
+            available_date=duplicate['available_date'],
+        ).exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0022_userprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_available, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='available',
+            index=models.Index(fields=['available_date', 'places_left'], name='available_date_places_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['product', 'start_date', 'end_date', 'status'], name='booking_product_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'start_date'], name='booking_user_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='available',
+            constraint=models.UniqueConstraint(fields=('product', 'available_date'), name='available_product_date_unique'),
+        ),
+    ]
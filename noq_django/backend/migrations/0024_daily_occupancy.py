@@ -0,0 +1,35 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0023_booking_available_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Datum')),
+                ('occupied', models.IntegerField(default=0)),
+                ('arrivals', models.IntegerField(default=0)),
+                ('departures', models.IntegerField(default=0)),
+                ('no_shows', models.IntegerField(default=0)),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.host')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='backend.product')),
+            ],
+            options={
+                'db_table': 'daily_occupancy',
+                'indexes': [models.Index(fields=['host', 'date'], name='occupancy_host_date_idx'), models.Index(fields=['date'], name='occupancy_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyoccupancy',
+            constraint=models.UniqueConstraint(fields=('product', 'date'), name='occupancy_product_date_unique'),
+        ),
+    ]
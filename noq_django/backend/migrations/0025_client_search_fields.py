@@ -0,0 +1,62 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:16
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_string(text):
+    # Frozen copy of backend.util.normalize_string as it was when this
+    # migration was written, corrected in 0028
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8').lower()
+
+
+def populate_search_fields(apps, schema_editor):
+    Client = apps.get_model('backend', 'Client')
+    clients = list(Client.objects.only('first_name', 'last_name', 'unokod'))
+
+    for client in clients:
+        client.search_first_name = normalize_string(client.first_name or '').strip()
+        client.search_last_name = normalize_string(client.last_name or '').strip()
+        client.search_unokod = normalize_string(client.unokod or '').strip()
+
+    Client.objects.bulk_update(
+        clients, ['search_first_name', 'search_last_name', 'search_unokod'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0024_daily_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_first_name',
+            field=models.CharField(default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_last_name',
+            field=models.CharField(default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_unokod',
+            field=models.CharField(default='', editable=False, max_length=10),
+        ),
+        migrations.RunPython(populate_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['search_first_name'], name='client_search_first_name_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['search_last_name'], name='client_search_last_name_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['search_unokod'], name='client_search_unokod_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.10 on 2026-10-18 11:40
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_FIELDS = ['search_first_name', 'search_last_name', 'search_unokod']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN trigram indexes for fuzzy guest search, PostgreSQL only
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS client_{field}_trgm_idx '
+            f'ON client USING gin ({field} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS client_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0025_client_search_fields'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
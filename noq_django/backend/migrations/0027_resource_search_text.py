@@ -0,0 +1,66 @@
+# Generated by Django 4.2.10 on 2026-10-18 12:05
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_string(text):
+    # Frozen copy of backend.util.normalize_string as it was when this
+    # migration was written, corrected in 0028
+    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8').lower()
+
+
+def populate_search_text(apps, schema_editor):
+    Resource = apps.get_model('backend', 'Resource')
+    resources = list(Resource.objects.all())
+
+    for resource in resources:
+        if isinstance(resource.applies_to, str):
+            resource.applies_to = [val.strip() for val in resource.applies_to.split(',') if val.strip()]
+        fields = [
+            resource.name, resource.address, resource.email, resource.phone,
+            resource.other, resource.target_group,
+        ] + list(resource.applies_to or [])
+        resource.search_text = ' '.join(normalize_string(str(field)) for field in fields)
+
+    Resource.objects.bulk_update(resources, ['applies_to', 'search_text'], batch_size=1000)
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN indexes for applies_to containment and search_text LIKE '%...%'
+    # (pg_trgm, see 0026), PostgreSQL only
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS resource_applies_to_idx '
+        'ON backend_resource USING gin (applies_to jsonb_path_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS resource_search_text_trgm_idx '
+        'ON backend_resource USING gin (search_text gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS resource_applies_to_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS resource_search_text_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0026_client_search_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='search_text',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
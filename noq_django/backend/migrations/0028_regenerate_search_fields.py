@@ -0,0 +1,50 @@
+# Generated by Django 4.2.10 on 2026-10-18 12:40
+
+import unicodedata
+
+from django.db import migrations
+
+
+def normalize_string(text):
+    # Frozen copy of backend.util.normalize_string, only the accents are
+    # removed and all other letters are kept
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn').casefold()
+
+
+def regenerate_search_fields(apps, schema_editor):
+    # The normalizer in 0025 and 0027 dropped every non-ASCII letter, not
+    # just the accents, so the search fields are regenerated
+    Client = apps.get_model('backend', 'Client')
+    clients = list(Client.objects.only('first_name', 'last_name', 'unokod'))
+
+    for client in clients:
+        client.search_first_name = normalize_string(client.first_name or '').strip()[:32]
+        client.search_last_name = normalize_string(client.last_name or '').strip()[:32]
+        client.search_unokod = normalize_string(client.unokod or '').strip()[:10]
+
+    Client.objects.bulk_update(
+        clients, ['search_first_name', 'search_last_name', 'search_unokod'], batch_size=1000)
+
+    Resource = apps.get_model('backend', 'Resource')
+    resources = list(Resource.objects.all())
+
+    for resource in resources:
+        fields = [
+            resource.name, resource.address, resource.email, resource.phone,
+            resource.other, resource.target_group,
+        ] + list(resource.applies_to or [])
+        resource.search_text = ' '.join(normalize_string(str(field)) for field in fields)
+
+    Resource.objects.bulk_update(resources, ['search_text'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0027_resource_search_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(regenerate_search_fields, migrations.RunPython.noop),
+    ]
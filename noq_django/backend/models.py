@@ -1,14 +1,18 @@
-from django.db import models
-from django.db.models import Q
+from django.db import connection, models, transaction
+from django.db.models import F, Q, Case, When, Min, Sum, Value, ExpressionWrapper, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, Greatest, Least
 from django.core.exceptions import ValidationError
 
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
+from collections import Counter, defaultdict
 from datetime import date, datetime, timedelta
 from django.utils import timezone
 from enum import IntEnum
+import json
 
 from .models_volunteer_task import VolunteerTask
+from .util import normalize_string
 
 class State(IntEnum):
     PENDING = 1
@@ -21,6 +25,15 @@ class State(IntEnum):
     COMPLETED = 8
     ADVISED_AGAINST = 9
 
+# Bokningar med dessa statusar tar inte någon plats i anspråk
+NON_OCCUPYING_STATES = [State.DECLINED, State.IN_QUEUE, State.COMPLETED]
+
+# Statistik: bokningar som aldrig har hållit en plats, gästen har checkat
+# in respektive en bekräftad bokning som gästen aldrig kom till
+NOT_STAYING_STATES = [State.DECLINED, State.IN_QUEUE]
+STAYED_STATES = [State.CHECKED_IN, State.COMPLETED]
+NO_SHOW_STATES = [State.ACCEPTED, State.RESERVED, State.CONFIRMED]
+
 class Region(models.Model):
     name = models.CharField(max_length=80)
 
@@ -80,15 +93,46 @@ class Client(models.Model):
     ]
     flag = models.BooleanField(default=True)
 
+    # Normaliserade kopior (gemener utan accenter) av namn och unokod för sökning,
+    # sätts i save(), se search_value()
+    search_first_name = models.CharField(max_length=32, default="", editable=False)
+    search_last_name = models.CharField(max_length=32, default="", editable=False)
+    search_unokod = models.CharField(max_length=10, default="", editable=False)
+
     class Meta:
         db_table = "client"
 
         verbose_name_plural = "client"
 
+        # varchar_pattern_ops så att prefixsökning (LIKE 'abc%') kan använda index i PostgreSQL
+        indexes = [
+            models.Index(fields=["search_first_name"], name="client_search_first_name_idx",
+                         opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["search_last_name"], name="client_search_last_name_idx",
+                         opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["search_unokod"], name="client_search_unokod_idx",
+                         opclasses=["varchar_pattern_ops"]),
+        ]
+
     def name(self) -> str:
         return f"{self.first_name} {self.last_name}"
 
+    @classmethod
+    def search_value(cls, field, text):
+        """
+        text normaliserad för sökfältet field, t.ex. "search_last_name".
+        Kortas till fältets längd, då normaliseringen kan förlänga texten
+        ("ß" -> "ss").
+        """
+        return normalize_string(text or "").strip()[:cls._meta.get_field(field).max_length]
+
+    def update_search_fields(self):
+        self.search_first_name = Client.search_value("search_first_name", self.first_name)
+        self.search_last_name = Client.search_value("search_last_name", self.last_name)
+        self.search_unokod = Client.search_value("search_unokod", self.unokod)
+
     def save(self, *args, **kwargs):
+        self.update_search_fields()
         if (
             "fake_data" in kwargs
         ):  # Om data är genererat av script använd istället för time.now
@@ -129,6 +173,22 @@ class Host(models.Model):
         return f"{self.name}, {self.city}"
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_places_left(self, start_date, end_date=None):
+        """
+        Annoterar places_left, det minsta antalet lediga platser någon natt
+        från start_date till end_date (ej inkluderad, default en natt), i
+        samma fråga. Nätter utan Available har inga bokningar och räknas
+        som total_places.
+        """
+        if end_date is None:
+            end_date = start_date + timedelta(days=1)
+        places_left = Available.objects.filter(
+            product=OuterRef("pk"), available_date__gte=start_date, available_date__lt=end_date
+        ).values("product").annotate(min_places_left=Min("places_left")).values("min_places_left")
+        return self.annotate(places_left=Coalesce(Subquery(places_left), "total_places"))
+
+
 class Product(models.Model):
     """
     Product är en generalisering som möjliggör att ett härbärge
@@ -160,6 +220,8 @@ class Product(models.Model):
     )
     bookable = models.BooleanField(default=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         db_table = "product"
 
@@ -175,12 +237,194 @@ class Product(models.Model):
 
         # return f"{self.description} ({self.total_places} platser på {self.host.name}, {self.host.city} ({booking_count} bokade)"
 
+class BookingStatusManager(models.Manager):
+    """
+    Statusarna är fast grunddata (id = State, skapas i migrering 0012) och
+    ändras inte medan systemet körs. De hålls därför i en cache per process
+    som inte töms, en ändrad status kräver omstart. Samma instans delas av
+    alla anrop och får inte ändras. clear_cache() är till för tester och
+    skript som skapar statusarna själva.
+    """
+    _cache = None
+
+    def get_state(self, state):
+        # Hämta status för ett State-id utan att fråga databasen varje gång
+        cache = BookingStatusManager._cache
+        if cache is None or state not in cache:
+            cache = {status.id: status for status in self.all()}
+            BookingStatusManager._cache = cache
+
+        if state not in cache:
+            raise self.model.DoesNotExist(f"Booking status {state} does not exist.")
+        return cache[state]
+
+    def clear_cache(self):
+        BookingStatusManager._cache = None
+
+
 class BookingStatus(models.Model):
     description = models.CharField(max_length=32)
 
+    objects = BookingStatusManager()
+
     def __str__(self):
         return self.description
 
+class BookingQuerySet(models.QuerySet):
+    def occupying(self):
+        # Bokningar som tar en plats i anspråk, declined, in_queue och
+        # completed räknas inte
+        return self.exclude(status_id__in=NON_OCCUPYING_STATES)
+
+    def count_per_date(self, product, start_date, end_date):
+        """
+        Antal platsupptagande bokningar per natt för en produkt mellan
+        start_date och end_date (end_date ej inkluderad).
+
+        Hämtar alla överlappande bokningar i en query och summerar dem i
+        en svepning, oavsett hur många nätter perioden omfattar.
+        """
+        nr_of_days = (end_date - start_date).days
+        if nr_of_days <= 0:
+            return {}
+
+        # Differensvektor: +1 första natten, -1 dagen efter sista natten
+        deltas = [0] * (nr_of_days + 1)
+        stays = self.occupying().filter(
+            product=product,
+            start_date__lt=end_date,
+            end_date__gt=start_date,
+        ).values_list("start_date", "end_date")
+
+        for stay_start, stay_end in stays:
+            deltas[max((stay_start - start_date).days, 0)] += 1
+            deltas[min((stay_end - start_date).days, nr_of_days)] -= 1
+
+        booking_counts = {}
+        count = 0
+        for i in range(nr_of_days):
+            count += deltas[i]
+            booking_counts[f"{start_date + timedelta(days=i):%Y-%m-%d}"] = count
+
+        return booking_counts
+
+    def with_nights(self, start_date, end_date):
+        """
+        Bokningar som överlappar perioden, annoterade med nights: antalet
+        nätter av bokningen mellan start_date och end_date (ej inkluderad).
+        Beräknas i databasen, så att summor inte kräver att bokningarna
+        hämtas.
+        """
+        return self.filter(start_date__lt=end_date, end_date__gt=start_date).annotate(
+            nights=ExpressionWrapper(
+                Least("end_date", Value(end_date)) - Greatest("start_date", Value(start_date)),
+                output_field=models.DurationField(),
+            )
+        )
+
+    def nights_per(self, start_date, end_date, *fields):
+        """
+        Summa nätter under perioden grupperat på fields, t.ex.
+        nights_per(start, end, "product__host__region__name")
+        """
+        return (
+            self.with_nights(start_date, end_date)
+            .values(*fields)
+            .annotate(total_nights=Sum("nights"))
+            .order_by(*fields)
+        )
+
+    def total_nights(self, start_date, end_date):
+        # Totalt antal nätter under perioden som ett heltal
+        total = self.with_nights(start_date, end_date).aggregate(total=Sum("nights"))["total"]
+        return total.days if total else 0
+
+    def transition(self, status_id):
+        """
+        Sätt status_id på bokningarna i querysetet i en UPDATE, för
+        batchändringar. Bokningarna hämtas och kontrolleras i minnet, och
+        Available och DailyOccupancy uppdateras en gång per produkt istället
+        för en save() per bokning.
+
+        Returnerar (ändrade bokningar, {boknings-id: felmeddelande}) för
+        bokningar som inte kan få den nya statusen.
+        """
+        with transaction.atomic():
+            # Lås produkterna före bokningarna, i samma ordning som save()
+            product_ids = set(self.values_list("product_id", flat=True))
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update().filter(id__in=product_ids).order_by("id")
+            }
+            bookings = list(self.select_for_update().order_by("id"))
+
+            today = date.today()
+            errors = {}
+            changed = []
+            # Bokningar som börjar ta en plats, per produkt
+            taking_place = defaultdict(list)
+            for booking in bookings:
+                booking.product = products[booking.product_id]
+                if booking.start_date < today and status_id != State.COMPLETED:
+                    errors[booking.id] = "Fel: Bokningen börjar före dagens datum!"
+                elif booking.status_id in NON_OCCUPYING_STATES and status_id not in NON_OCCUPYING_STATES:
+                    taking_place[booking.product_id].append(booking)
+                else:
+                    changed.append(booking)
+
+            # Kontrollera lediga platser, en fråga per produkt
+            for product_id, product_bookings in taking_place.items():
+                product = products[product_id]
+                bookings_per_date = Booking.objects.count_per_date(
+                    product,
+                    min(booking.start_date for booking in product_bookings),
+                    max(booking.end_date for booking in product_bookings),
+                )
+                for booking in product_bookings:
+                    nights = [f"{night:%Y-%m-%d}" for night in booking.stay_nights()]
+                    if all(bookings_per_date[night] < product.total_places for night in nights):
+                        for night in nights:
+                            bookings_per_date[night] += 1
+                        changed.append(booking)
+                    else:
+                        errors[booking.id] = "Fullbokat rum"
+
+            if not changed:
+                return [], errors
+
+            self.model.objects.filter(id__in=[booking.id for booking in changed]).update(status_id=status_id)
+
+            # Summera förändringen per produkt och datum
+            places_deltas = defaultdict(Counter)
+            occupancy_deltas = defaultdict(lambda: defaultdict(Counter))
+            status = BookingStatus.objects.get_state(status_id)
+            for booking in changed:
+                previous_nights = booking.occupied_nights()
+                previous_counts = booking.occupancy_counts()
+                booking.status = status
+
+                places_deltas[booking.product_id].update(previous_nights - booking.occupied_nights())
+                places_deltas[booking.product_id].subtract(booking.occupied_nights() - previous_nights)
+                for day, counts in booking.occupancy_counts().items():
+                    occupancy_deltas[booking.product_id][day].update(counts)
+                for day, counts in previous_counts.items():
+                    occupancy_deltas[booking.product_id][day].subtract(counts)
+
+            for product_id, deltas in places_deltas.items():
+                # En UPDATE per storlek på förändringen
+                days_per_delta = defaultdict(set)
+                for day, delta in deltas.items():
+                    if delta:
+                        days_per_delta[delta].add(day)
+                for delta, days in days_per_delta.items():
+                    Available.objects.apply_delta(products[product_id], days, delta)
+
+            for product_id, deltas in occupancy_deltas.items():
+                DailyOccupancy.objects.apply_delta(products[product_id], deltas)
+
+        return changed, errors
+
+
 class Booking(models.Model):
     """
     Booking är en bokning av en produkt av en User
@@ -204,32 +448,75 @@ class Booking(models.Model):
         blank=False, verbose_name="Bokningsstatus"
     )
 
+    objects = BookingQuerySet.as_manager()
+
     class Meta:
         db_table = "product_booking"
+        indexes = [
+            # Beläggning och värdarnas listor: produkt, period och status
+            models.Index(
+                fields=["product", "start_date", "end_date", "status"],
+                name="booking_product_dates_idx",
+            ),
+            # Brukarens bokningar
+            models.Index(fields=["user", "start_date"], name="booking_user_start_idx"),
+        ]
 
     def ready(self):
         from . import signals
 
-    # return count of accepted, pending and checked_in bookings
+    # Full omräkning av Available för bokningens period
     def calc_available(self):
-        bookings_per_day = self.bookings_count_per_date()
-        for date in bookings_per_day:
-            places_left = self.product.total_places - bookings_per_day[date]
-
-            existing_availability = Available.objects.filter(
-                product=self.product, available_date=date
-            ).first()
-
-            if existing_availability:
-                existing_availability.places_left = places_left
-                existing_availability.save()
-            else:
-                product_available = Available(
-                    available_date=date,
-                    product=Product.objects.get(id=self.product.id),
-                    places_left=places_left,
-                )
-                product_available.save()
+        start_date, end_date = self.stay_dates()
+        Available.objects.recalc(self.product, start_date, end_date)
+
+    def stay_nights(self):
+        # Alla nätter från start_date till end_date (ej inkluderad)
+        start_date, end_date = self.stay_dates()
+        return {start_date + timedelta(days=i) for i in range((end_date - start_date).days)}
+
+    def occupied_nights(self):
+        # Nätter som bokningen tar en plats i anspråk
+        if self.status_id in NON_OCCUPYING_STATES:
+            return set()
+        return self.stay_nights()
+
+    def occupancy_counts(self):
+        # Bokningens bidrag till DailyOccupancy per datum
+        return DailyOccupancy.objects.booking_counts(self.status_id, *self.stay_dates())
+
+    def update_occupancy(self, previous=None):
+        """
+        Uppdatera DailyOccupancy med skillnaden mot bokningens tidigare
+        sparade tillstånd (previous).
+        """
+        deltas = self.occupancy_counts()
+        if previous and previous.product_id != self.product_id:
+            DailyOccupancy.objects.apply_delta(
+                previous.product,
+                {day: Counter({field: -n for field, n in counts.items()})
+                 for day, counts in previous.occupancy_counts().items()},
+            )
+        elif previous:
+            for day, counts in previous.occupancy_counts().items():
+                deltas[day].subtract(counts)
+
+        DailyOccupancy.objects.apply_delta(self.product, deltas)
+
+    def update_available(self, previous=None):
+        """
+        Uppdatera Available stegvis med skillnaden mot bokningens tidigare
+        sparade tillstånd (previous), istället för att räkna om alla datum.
+        """
+        nights = self.occupied_nights()
+        previous_nights = previous.occupied_nights() if previous else set()
+
+        if previous and previous.product_id != self.product_id:
+            Available.objects.apply_delta(previous.product, previous_nights, 1)
+            previous_nights = set()
+
+        Available.objects.apply_delta(self.product, nights - previous_nights, -1)
+        Available.objects.apply_delta(self.product, previous_nights - nights, 1)
 
     def save(self, *args, **kwargs):
 
@@ -259,77 +546,150 @@ class Booking(models.Model):
                     code="woman-only",
                 )
 
-        status_list = ['completed', 'declined']
-        # Check if there is another booking for the same user and date
-        existing_booking = Booking.objects.filter(
-            user=self.user, start_date=self.start_date
-        ).exclude(status__description__in=status_list).first()
+        with transaction.atomic():
+            # Lås produkten så att samtidiga bokningar av samma produkt
+            # kontrolleras och sparas en i taget, andra produkter påverkas inte
+            Product.objects.select_for_update().get(id=self.product_id)
 
-        if existing_booking and self.id != existing_booking.id:
-            raise ValidationError(
-                ("Har redan en bokning samma dag!"),
-                code="already_booked",
-            )
-            
-        # Get existing bookings that overlap, excluding the current booking being updated
-        existing_bookings = Booking.objects.filter(
-            user=self.user,
-            start_date__lt=self.end_date,
-            end_date__gt=self.start_date,
-        ).exclude(id=self.id)  # Exclude the current booking
-
-        # If there are overlapping bookings, raise a ValidationError
-        if existing_bookings.exists():
-            raise ValidationError(
-                ("You already have a booking that overlaps with these dates."),
-                code="overlapping_booking",
-            )
+            status_list = [State.COMPLETED, State.DECLINED]
+            # Check if there is another booking for the same user and date
+            existing_booking = Booking.objects.filter(
+                user=self.user, start_date=self.start_date
+            ).exclude(status_id__in=status_list).first()
 
-        # Check if there is free places available for the booking period
-        # - Booking count is only valid if booking has status pending
-        # - in_queue or declined will not book a place
-        # - accepted, advised_against, reserved, confirmed or checked_in already have
-        #   a booked place
-        if self.status.id == State.PENDING:
-            bookings_per_date = self.bookings_count_per_date()
-            places_are_available = all(
-                count < self.product.total_places for count in bookings_per_date.values())
-            if not places_are_available:
+            if existing_booking and self.id != existing_booking.id:
                 raise ValidationError(
-                    ("Fullbokat rum"),
-                    params={"bookings_per_date": bookings_per_date, "nr_or_places": self.product.total_places},
-                    code="full"
+                    ("Har redan en bokning samma dag!"),
+                    code="already_booked",
                 )
 
-        super().save(*args, **kwargs)
+            # Get existing bookings that overlap, excluding the current booking being updated
+            existing_bookings = Booking.objects.filter(
+                user=self.user,
+                start_date__lt=self.end_date,
+                end_date__gt=self.start_date,
+            ).exclude(id=self.id)  # Exclude the current booking
+
+            # If there are overlapping bookings, raise a ValidationError
+            if existing_bookings.exists():
+                raise ValidationError(
+                    ("You already have a booking that overlaps with these dates."),
+                    code="overlapping_booking",
+                )
 
-        # Uppdatera Available
-        self.calc_available()
+            # Check if there is free places available for the booking period
+            # - Booking count is only valid if booking has status pending
+            # - in_queue or declined will not book a place
+            # - accepted, advised_against, reserved, confirmed or checked_in already have
+            #   a booked place
+            if self.status.id == State.PENDING:
+                bookings_per_date = self.bookings_count_per_date()
+                places_are_available = all(
+                    count < self.product.total_places for count in bookings_per_date.values())
+                if not places_are_available:
+                    raise ValidationError(
+                        ("Fullbokat rum"),
+                        params={"bookings_per_date": bookings_per_date, "nr_or_places": self.product.total_places},
+                        code="full"
+                    )
+
+            # Tidigare sparat tillstånd behövs för att räkna ut förändringen
+            previous = (
+                Booking.objects.select_for_update().filter(id=self.id).first()
+                if self.id else None
+            )
 
-    def bookings_count_per_date(self):
-        # Return count for bookings for each day of the booking
-        date_delta = (self.end_date - self.start_date).days
-        booking_counts = {}
+            super().save(*args, **kwargs)
 
-        for i in range(date_delta):
-            date_time = self.start_date + timedelta(days=i)
-            count = Booking.objects.filter(
-                Q(product=self.product)
-                & Q(start_date__lte=date_time)
-                & Q(end_date__gt=date_time)
-                & ~Q(status=State.DECLINED)
-                & ~Q(status=State.IN_QUEUE)
-                & ~Q(status=State.COMPLETED)
-            ).count()
-            date = f"{date_time:%Y-%m-%d}"
-            booking_counts[date] = count
+            # Uppdatera Available och beläggningsstatistiken
+            self.update_available(previous)
+            self.update_occupancy(previous)
 
-        return booking_counts
+    def stay_dates(self):
+        # start_date och end_date kan vara datetime innan bokningen har sparats
+        start_date = self._meta.get_field("start_date").to_python(self.start_date)
+        end_date = self._meta.get_field("end_date").to_python(self.end_date)
+        return start_date, end_date
+
+    def bookings_count_per_date(self):
+        # Return count for bookings for each day of the booking
+        start_date, end_date = self.stay_dates()
+        return Booking.objects.count_per_date(self.product, start_date, end_date)
 
     def __str__(self) -> str:
         return f"{self.start_date}: {self.user.first_name} {self.user.last_name} har bokat {self.product.description} på {self.product.host.name}, {self.product.host.city}"
 
 
+class AvailableQuerySet(models.QuerySet):
+    def recalc(self, product, start_date, end_date):
+        """
+        Räkna om places_left för en produkt mellan start_date och end_date
+        (end_date ej inkluderad) utifrån bokningarna.
+        """
+        bookings_per_day = Booking.objects.count_per_date(product, start_date, end_date)
+
+        # Skapa eller uppdatera alla datum i en upsert på (product, available_date)
+        self.bulk_create(
+            [
+                Available(
+                    available_date=start_date + timedelta(days=i),
+                    product=product,
+                    places_left=product.total_places - count,
+                )
+                for i, count in enumerate(bookings_per_day.values())
+            ],
+            update_conflicts=True,
+            unique_fields=["product", "available_date"],
+            update_fields=["places_left"],
+        )
+
+    def apply_delta(self, product, days, places_delta):
+        """
+        Ändra places_left med places_delta för de angivna datumen. F() gör
+        att samtidiga bokningar inte skriver över varandras ändringar.
+        Datum som saknar Available räknas om från bokningarna.
+        """
+        if not days:
+            return
+
+        updated_count = self.filter(
+            product=product, available_date__in=days
+        ).update(places_left=F("places_left") + places_delta)
+
+        if updated_count != len(days):
+            existing_days = set(
+                self.filter(product=product, available_date__in=days)
+                .values_list("available_date", flat=True)
+            )
+            missing_days = set(days) - existing_days
+            if missing_days:
+                self.recalc(product, min(missing_days), max(missing_days) + timedelta(days=1))
+
+    def calendar(self, products, start_date, nr_of_days):
+        """
+        Ger (product, places_left per dag) för produkterna under nr_of_days
+        dagar från start_date. Alla Available hämtas i en fråga och läses
+        i ordning, så att en rad i taget kan byggas och strömmas. Dagar
+        utan Available har inga bokningar och får total_places.
+        """
+        products = list(products.order_by("id"))
+        rows = self.filter(
+            product__in=[product.id for product in products],
+            available_date__gte=start_date,
+            available_date__lt=start_date + timedelta(days=nr_of_days),
+        ).order_by("product_id", "available_date").values_list(
+            "product_id", "available_date", "places_left"
+        ).iterator()
+
+        row = next(rows, None)
+        for product in products:
+            places_left = [product.total_places] * nr_of_days
+            while row is not None and row[0] == product.id:
+                places_left[(row[1] - start_date).days] = row[2]
+                row = next(rows, None)
+            yield product, places_left
+
+
 class Available(models.Model):
     available_date = models.DateField(verbose_name="Datum")
     product = models.ForeignKey(
@@ -337,13 +697,154 @@ class Available(models.Model):
     )
     places_left = models.IntegerField(verbose_name="Platser kvar", default=0)
 
+    objects = AvailableQuerySet.as_manager()
+
     class Meta:
         db_table = "product_available"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "available_date"],
+                name="available_product_date_unique",
+            ),
+        ]
+        indexes = [
+            # Lediga/fullbokade produkter för ett datum
+            models.Index(
+                fields=["available_date", "places_left"],
+                name="available_date_places_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.product.description} på {self.product.host.name}, {self.product.host.city} har {self.places_left} platser kvar"
 
 
+class DailyOccupancyQuerySet(models.QuerySet):
+    def booking_counts(self, status_id, start_date, end_date):
+        """
+        En boknings bidrag per datum, {datum: Counter(fält=antal)}.
+        Avresan räknas på end_date, dagen efter sista natten.
+        """
+        counts = defaultdict(Counter)
+        if status_id not in NOT_STAYING_STATES:
+            for i in range((end_date - start_date).days):
+                counts[start_date + timedelta(days=i)]["occupied"] += 1
+        if status_id in STAYED_STATES:
+            counts[start_date]["arrivals"] += 1
+            counts[end_date]["departures"] += 1
+        elif status_id in NO_SHOW_STATES:
+            counts[start_date]["no_shows"] += 1
+        return counts
+
+    def apply_delta(self, product, deltas):
+        """
+        Ändra räknarna med deltas, {datum: {fält: ändring}}. F() gör att
+        samtidiga bokningar inte skriver över varandras ändringar.
+        """
+        deltas = {
+            day: {field: n for field, n in changes.items() if n}
+            for day, changes in deltas.items()
+        }
+        deltas = {day: changes for day, changes in deltas.items() if changes}
+
+        # Rader skapas bara för ökningar, en minskning av en rad som saknas
+        # rättas med rebuild_occupancy
+        self.bulk_create(
+            [
+                DailyOccupancy(host_id=product.host_id, product=product, date=day)
+                for day, changes in deltas.items()
+                if any(n > 0 for n in changes.values())
+            ],
+            ignore_conflicts=True,
+        )
+
+        # Datum med samma ändring uppdateras i samma fråga
+        days_per_change = defaultdict(list)
+        for day, changes in deltas.items():
+            days_per_change[tuple(sorted(changes.items()))].append(day)
+        for changes, days in days_per_change.items():
+            self.filter(product=product, date__in=days).update(
+                **{field: F(field) + n for field, n in changes}
+            )
+
+    def rebuild(self, product, start_date, end_date):
+        """
+        Räkna om produktens rader mellan start_date och end_date (ej
+        inkluderad) från bokningarna.
+        """
+        totals = defaultdict(Counter)
+        bookings = Booking.objects.filter(
+            product=product, start_date__lt=end_date, end_date__gte=start_date
+        ).values_list("status_id", "start_date", "end_date")
+        for status_id, booking_start, booking_end in bookings.iterator():
+            for day, counts in self.booking_counts(status_id, booking_start, booking_end).items():
+                if start_date <= day < end_date:
+                    totals[day].update(counts)
+
+        with transaction.atomic():
+            self.filter(product=product, date__gte=start_date, date__lt=end_date).delete()
+            self.bulk_create([
+                DailyOccupancy(host_id=product.host_id, product=product, date=day, **counts)
+                for day, counts in totals.items()
+                if any(counts.values())
+            ])
+
+    def per_date(self, start_date, end_date):
+        # Summor per datum, t.ex. för en värd: filter(host=host).per_date(...)
+        # En bokning som gästen inte har checkat in på är uteblivet först när
+        # datumet har passerat, så no_shows räknas bara före idag
+        return (
+            self.filter(date__gte=start_date, date__lt=end_date)
+            .values("date")
+            .annotate(
+                occupied=Sum("occupied"),
+                arrivals=Sum("arrivals"),
+                departures=Sum("departures"),
+                no_shows=Sum(Case(When(date__lt=timezone.localdate(), then="no_shows"), default=0)),
+            )
+            .order_by("date")
+        )
+
+
+class DailyOccupancy(models.Model):
+    """
+    Beläggning per produkt och datum för statistik, uppdateras stegvis när
+    bokningar ändras och kan räknas om med rebuild_occupancy.
+
+    occupied: platser som har hållits natten, arrivals och departures:
+    incheckade gäster som kom respektive lämnade datumet, no_shows:
+    bekräftade bokningar som börjar datumet där gästen inte har checkat in.
+    no_shows gäller som uteblivna först när datumet har passerat, se
+    per_date().
+    """
+    host = models.ForeignKey(Host, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    date = models.DateField(verbose_name="Datum")
+    occupied = models.IntegerField(default=0)
+    arrivals = models.IntegerField(default=0)
+    departures = models.IntegerField(default=0)
+    no_shows = models.IntegerField(default=0)
+
+    objects = DailyOccupancyQuerySet.as_manager()
+
+    class Meta:
+        db_table = "daily_occupancy"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "date"],
+                name="occupancy_product_date_unique",
+            ),
+        ]
+        indexes = [
+            # Statistik för en värd över en period
+            models.Index(fields=["host", "date"], name="occupancy_host_date_idx"),
+            models.Index(fields=["date"], name="occupancy_date_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product} {self.date}: {self.occupied} belagda platser"
+
+
 class InvoiceStatus(models.Model):
     OPEN = 'open'
     PAID = 'paid'
@@ -476,6 +977,58 @@ APPLIES_TO_OPTIONS = [
     "Socialtjänstkontakt", "Bostadssökande"
     ]
 
+class ResourceQuerySet(models.QuerySet):
+    def search(self, text):
+        """
+        Resurser där text finns i något av de sökbara fälten, utan hänsyn
+        till versaler och accenter. Söker i search_text som sätts i save().
+        """
+        return self.filter(search_text__contains=normalize_string(text).strip())
+
+    def applies_to_any(self, tags):
+        """
+        Resurser där applies_to innehåller någon av tags
+        """
+        condition = Q()
+        if connection.features.supports_json_field_contains:
+            for tag in tags:
+                condition |= Q(applies_to__contains=[tag])
+            return self.filter(condition)
+
+        # T.ex. SQLite saknar JSON contains, sök då på taggen som JSON-sträng
+        # i den lagrade JSON-texten
+        for tag in tags:
+            condition |= Q(applies_to_text__contains=json.dumps(tag))
+        return self.annotate(applies_to_text=Cast("applies_to", models.TextField())).filter(condition)
+
+    def with_is_open(self, at=None):
+        """
+        Annoterar is_open, om resursen har öppet klockan at (default nu).
+        Om closing_time är före opening_time är resursen öppen över midnatt,
+        t.ex. 22:00 - 06:00.
+        """
+        at = (at or timezone.localtime().time()).replace(microsecond=0)
+        return self.annotate(is_open=Case(
+            When(open_condition(at), then=Value(True)),
+            default=Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+    def open_at(self, at=None):
+        """
+        Resurser som har öppet klockan at (default nu), i samma fråga
+        """
+        return self.with_is_open(at).filter(is_open=True)
+
+
+def open_condition(at):
+    # Öppet samma dygn, eller över midnatt: efter öppning eller före stängning
+    return (
+        (Q(opening_time__lte=F("closing_time")) & Q(opening_time__lte=at, closing_time__gte=at))
+        | (Q(opening_time__gt=F("closing_time")) & (Q(opening_time__lte=at) | Q(closing_time__gte=at)))
+    )
+
+
 class Resource(models.Model):
     SERVICE_TYPE_CHOICES = [
         ('direktinsats', 'Direktinsats'),
@@ -492,12 +1045,35 @@ class Resource(models.Model):
     other = models.TextField(blank=True)
     applies_to = models.JSONField(blank=True, default=list)
 
+    # Normaliserad text (gemener utan accenter) från de sökbara fälten, sätts i save()
+    search_text = models.TextField(default="", editable=False)
+
+    objects = ResourceQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+    def update_search_text(self):
+        fields = [self.name, self.address, self.email, self.phone, self.other, self.target_group]
+        fields.extend(self.applies_to)
+        self.search_text = " ".join(normalize_string(str(field)) for field in fields)
+
+    def save(self, *args, **kwargs):
+        # applies_to kan komma som kommaseparerad text, spara alltid som lista
+        if isinstance(self.applies_to, str):
+            self.applies_to = [val.strip() for val in self.applies_to.split(",") if val.strip()]
+        self.update_search_text()
+        super().save(*args, **kwargs)
+
     def is_open_now(self):
+        # Annoterat av ResourceQuerySet.with_is_open för listor
+        if hasattr(self, "is_open"):
+            return self.is_open
         now = timezone.localtime().time()
-        return self.opening_time <= now <= self.closing_time
+        if self.opening_time <= self.closing_time:
+            return self.opening_time <= now <= self.closing_time
+        # Öppet över midnatt
+        return now >= self.opening_time or now <= self.closing_time
     
     
 SEX_CHOICES = (
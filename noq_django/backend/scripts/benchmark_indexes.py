@@ -0,0 +1,231 @@
+"""
+Jämför frågeplaner och svarstider för de vanligaste Booking- och
+Available-frågorna med och utan de sammansatta indexen.
+
+Skriptet tar tillfälligt bort index och unika constraints, kör det bara
+mot en databas som får fyllas med testdata och som ingen annan skriver
+till. Utan DEBUG krävs allow_drop=1, t.ex:
+
+    python manage.py runscript benchmark_indexes --script-args bookings=2000000
+    python manage.py runscript benchmark_indexes --script-args allow_drop=1
+
+I PostgreSQL tas indexen bort i en transaktion som rullas tillbaka efter
+mätningen, så de finns kvar även om skriptet avbryts. Tabellerna är låsta
+för andra under tiden. I SQLite (utveckling) tas de bort och läggs till
+igen.
+
+Genererad data läggs i regionen "Benchmark" och återanvänds vid nästa
+körning. Bokningarna skapas utan Booking.save(), så Available och
+DailyOccupancy räknas om för Benchmark-produkterna efteråt. Ta bort
+datan med:
+
+    python manage.py runscript benchmark_indexes --script-args cleanup=1
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max, Min
+
+from backend.models import Host, Client, Product, Region, Booking, Available, DailyOccupancy, State
+
+REGION_NAME = "Benchmark"
+BATCH_SIZE = 10000
+
+
+def parse_args(args):
+    options = {"bookings": 2000000, "hosts": 200, "clients": 50000, "repeat": 20, "allow_drop": 0, "cleanup": 0}
+    for arg in args:
+        key, value = arg.split("=")
+        options[key] = int(value)
+    return options
+
+
+def generate_data(options):
+    region, created = Region.objects.get_or_create(name=REGION_NAME)
+
+    hosts = list(Host.objects.filter(region=region))
+    for i in range(len(hosts), options["hosts"]):
+        hosts.append(Host.objects.create(name=f"Benchmark {i}", street="", city="Benchmark", region=region))
+
+    products = list(Product.objects.filter(host__region=region))
+    if not products:
+        products = Product.objects.bulk_create([
+            Product(name="room", description="Benchmark", total_places=random.randint(5, 40), host=host, type="room")
+            for host in hosts for _ in range(3)
+        ])
+
+    clients = list(Client.objects.filter(region=region).values_list("id", flat=True))
+    if len(clients) < options["clients"]:
+        nr_of_users = options["clients"] - len(clients)
+        prefix = f"benchmark.{datetime.now():%Y%m%d%H%M%S}"
+        users = User.objects.bulk_create(
+            [User(username=f"{prefix}.{i}") for i in range(nr_of_users)], batch_size=BATCH_SIZE)
+        new_clients = Client.objects.bulk_create(
+            [Client(user=user, first_name="Bench", last_name="Mark", gender="K", region=region,
+                    last_edit=datetime.now(), search_first_name="bench", search_last_name="mark")
+             for user in users], batch_size=BATCH_SIZE)
+        clients += [client.id for client in new_clients]
+
+    nr_of_bookings = Booking.objects.filter(product__host__region=region).count()
+    today = datetime.now().date()
+    statuses = list(State)
+    print(f"Genererar {max(options['bookings'] - nr_of_bookings, 0)} bokningar")
+    while nr_of_bookings < options["bookings"]:
+        batch = []
+        for _ in range(min(BATCH_SIZE, options["bookings"] - nr_of_bookings)):
+            # Bokningar spridda över tre års historik och en månad framåt
+            start_date = today + timedelta(days=random.randint(-3 * 365, 30))
+            batch.append(Booking(
+                start_date=start_date,
+                end_date=start_date + timedelta(days=random.randint(1, 14)),
+                product=random.choice(products),
+                user_id=random.choice(clients),
+                status_id=random.choice(statuses),
+            ))
+        Booking.objects.bulk_create(batch)
+        nr_of_bookings += len(batch)
+
+    # Bokningarna skapades utan save(), räkna om hela den bokade perioden
+    booked = Booking.objects.filter(product__in=products).aggregate(first=Min("start_date"), last=Max("end_date"))
+    if booked["first"]:
+        for product in products:
+            Available.objects.recalc(product, booked["first"], booked["last"])
+            DailyOccupancy.objects.rebuild(product, booked["first"], booked["last"] + timedelta(days=1))
+
+    return hosts, products, clients
+
+
+def hot_queries(hosts, products, clients):
+    today = datetime.now().date()
+    product = random.choice(products)
+    host = random.choice(hosts)
+    return {
+        "beläggning per produkt": Booking.objects.occupying().filter(
+            product=product, start_date__lt=today + timedelta(days=30), end_date__gt=today
+        ).values_list("start_date", "end_date"),
+        "värdens väntande bokningar": Booking.objects.filter(
+            product__host=host, status_id__in=[State.PENDING, State.ACCEPTED, State.ADVISED_AGAINST],
+            start_date__gte=today,
+        ),
+        "brukarens bokningar": Booking.objects.filter(
+            user_id=random.choice(clients), start_date__gte=today
+        ).order_by("start_date"),
+        "available per produkt och datum": Available.objects.filter(
+            product=product, available_date=today
+        ),
+        "fullbokade produkter per datum": Available.objects.filter(
+            available_date=today, places_left=0
+        ).values("product_id"),
+    }
+
+
+def measure(queries, repeat):
+    result = {}
+    for name, queryset in queries.items():
+        plan = queryset.explain()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        result[name] = (plan, (time.perf_counter() - start) / repeat * 1000)
+    return result
+
+
+def existing_indexes(model):
+    with connection.cursor() as cursor:
+        return connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+
+def delete_data():
+    region = Region.objects.filter(name=REGION_NAME).first()
+    if not region:
+        print("Ingen Benchmark-data")
+        return
+
+    product_ids = list(Product.objects.filter(host__region=region).values_list("id", flat=True))
+    if product_ids:
+        # Bokningarna skapades utan save() och tas bort utan signalerna i
+        # backend/signals.py, i stället för att läsas in en och en
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {Booking._meta.db_table} WHERE product_id IN ({placeholders})", product_ids)
+            print(f"Tog bort {cursor.rowcount} bokningar")
+    Available.objects.filter(product_id__in=product_ids).delete()
+    DailyOccupancy.objects.filter(product_id__in=product_ids).delete()
+    Product.objects.filter(id__in=product_ids).delete()
+    User.objects.filter(client__region=region).delete()
+    Host.objects.filter(region=region).delete()
+    region.delete()
+    print("Benchmark-datan är borttagen")
+
+
+def drop_indexes():
+    with connection.schema_editor() as schema_editor:
+        for model in (Booking, Available):
+            indexes, constraints = model._meta.indexes, model._meta.constraints
+            # SQLite bygger om tabellen utifrån modellen när en constraint
+            # tas bort, så modellen får se ut som före migreringen
+            if connection.vendor == "sqlite":
+                model._meta.indexes, model._meta.constraints = [], []
+            try:
+                for constraint in constraints:
+                    schema_editor.remove_constraint(model, constraint)
+                for index in indexes:
+                    if index.name in existing_indexes(model):
+                        schema_editor.remove_index(model, index)
+            finally:
+                model._meta.indexes, model._meta.constraints = indexes, constraints
+
+
+def add_indexes():
+    with connection.schema_editor() as schema_editor:
+        for model in (Booking, Available):
+            # I SQLite skapar add_constraint även modellens index
+            for constraint in model._meta.constraints:
+                schema_editor.add_constraint(model, constraint)
+            for index in model._meta.indexes:
+                if index.name not in existing_indexes(model):
+                    schema_editor.add_index(model, index)
+
+
+def measure_without_indexes(queries, repeat):
+    if connection.vendor == "postgresql":
+        # DDL är transaktionell i PostgreSQL, indexen kommer tillbaka med
+        # rollback
+        with transaction.atomic():
+            drop_indexes()
+            result = measure(queries, repeat)
+            transaction.set_rollback(True)
+        return result
+
+    drop_indexes()
+    try:
+        return measure(queries, repeat)
+    finally:
+        add_indexes()
+
+
+def run(*args):
+    options = parse_args(args)
+    if options["cleanup"]:
+        delete_data()
+        return
+    if not settings.DEBUG and not options["allow_drop"]:
+        print("Tar bort index och constraints under mätningen, kör med DEBUG "
+              "eller --script-args allow_drop=1 mot en testdatabas")
+        return
+
+    hosts, products, clients = generate_data(options)
+    queries = hot_queries(hosts, products, clients)
+
+    before = measure_without_indexes(queries, options["repeat"])
+    after = measure(queries, options["repeat"])
+
+    for name in queries:
+        print(f"\n---- {name} ----")
+        print(f"Utan index: {before[name][1]:.2f} ms\n{before[name][0]}")
+        print(f"Med index:  {after[name][1]:.2f} ms\n{after[name][0]}")
@@ -0,0 +1,179 @@
+"""
+Fuzzy sökning av gäster (Client) på namn och unokod.
+
+I PostgreSQL används pg_trgm (trigram_similar med GIN-index), annars ett
+trigramindex i minnet som räknar likhet på samma sätt som pg_trgm, så att
+sökningen även fungerar med SQLite i utvecklingsmiljön.
+
+Sökfälten behåller alla bokstäver (se normalize_string), så även t.ex.
+kyrilliska namn kan matchas. pg_trgm räknar bara tecken som är bokstäver
+enligt databasens LC_CTYPE, så databasen behöver en UTF-8-locale.
+"""
+import heapq
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+
+from .models import Client
+
+# Samma som standardvärdet för pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+
+# Normaliserade sökfält på Client, se Client.update_search_fields
+SEARCH_FIELDS = ["search_first_name", "search_last_name", "search_unokod"]
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def trigrams(text):
+    """
+    Trigram för en text som i pg_trgm: varje ord får två blanksteg före och
+    ett efter, t.ex. "ola" -> {"  o", " ol", "ola", "la "}
+    """
+    result = set()
+    for word in WORD_RE.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a, b):
+    """
+    Andel gemensamma trigram, som pg_trgm similarity()
+    """
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class ClientTrigramIndex:
+    """
+    Trigramindex över gästernas sökfält i minnet.
+
+    Indexerar de olika värdena per fält, så att likheten räknas en gång per
+    namn i stället för per gäst. Byggs vid första sökningen och uppdateras
+    sedan per gäst via signaler när en Client sparas eller tas bort. Varje
+    process har sitt eget index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._loaded = False
+            # fält -> trigram -> värden som innehåller trigrammet
+            self._postings = {field: defaultdict(set) for field in SEARCH_FIELDS}
+            # fält -> värde -> id:n för gäster med värdet
+            self._clients = {field: defaultdict(set) for field in SEARCH_FIELDS}
+            # fält -> värde -> antal trigram i värdet
+            self._sizes = {field: {} for field in SEARCH_FIELDS}
+            # id -> värden i samma ordning som SEARCH_FIELDS
+            self._values = {}
+
+    def _load(self):
+        for client_id, *values in Client.objects.values_list("id", *SEARCH_FIELDS).iterator():
+            self._add(client_id, values)
+        self._loaded = True
+
+    def _add(self, client_id, values):
+        for field, value in zip(SEARCH_FIELDS, values):
+            if not self._clients[field][value]:
+                value_trigrams = trigrams(value)
+                self._sizes[field][value] = len(value_trigrams)
+                for trigram in value_trigrams:
+                    self._postings[field][trigram].add(value)
+            self._clients[field][value].add(client_id)
+        self._values[client_id] = values
+
+    def _remove(self, client_id):
+        for field, value in zip(SEARCH_FIELDS, self._values.pop(client_id, ())):
+            self._clients[field][value].discard(client_id)
+            if not self._clients[field][value]:
+                del self._clients[field][value]
+                del self._sizes[field][value]
+                for trigram in trigrams(value):
+                    self._postings[field][trigram].discard(value)
+
+    def update(self, client):
+        with self._lock:
+            if self._loaded:
+                self._remove(client.id)
+                self._add(client.id, [getattr(client, field) for field in SEARCH_FIELDS])
+
+    def remove(self, client_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(client_id)
+
+    def search(self, terms, limit):
+        """
+        Returnerar [(likhet, -id)] för de limit bästa gästerna där något av
+        fälten i terms ({fält: sökord}) är minst SIMILARITY_THRESHOLD likt.
+        Likheten är summan över fälten, som i PostgreSQL-sökningen.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            # fält -> värde -> likhet, för värden med minst ett gemensamt trigram
+            field_scores = {}
+            matched = set()
+            for field, value in terms.items():
+                query = trigrams(value)
+                shared = Counter()
+                for trigram in query:
+                    shared.update(self._postings[field].get(trigram, ()))
+
+                field_scores[field] = {}
+                for candidate, count in shared.items():
+                    score = count / (len(query) + self._sizes[field][candidate] - count)
+                    field_scores[field][candidate] = score
+                    if score >= SIMILARITY_THRESHOLD:
+                        matched.update(self._clients[field][candidate])
+
+            fields = [SEARCH_FIELDS.index(field) for field in field_scores]
+            scored = (
+                (sum(field_scores[SEARCH_FIELDS[i]].get(self._values[client_id][i], 0.0) for i in fields),
+                 -client_id)
+                for client_id in matched
+            )
+            return heapq.nlargest(limit, scored)
+
+
+client_trigram_index = ClientTrigramIndex()
+
+
+def fuzzy_search_clients(terms, limit):
+    """
+    De limit gäster som bäst liknar terms ({sökfält: normaliserat sökord}),
+    sorterade efter likhet. Varje gäst får attributet similarity.
+    """
+    if connection.vendor == "postgresql":
+        similarities = [TrigramSimilarity(field, value) for field, value in terms.items()]
+        condition = Q()
+        for field, value in terms.items():
+            condition |= Q(**{f"{field}__trigram_similar": value})
+        return list(
+            Client.objects.filter(condition)
+            .annotate(similarity=sum(similarities[1:], similarities[0]))
+            .select_related("region")
+            .order_by("-similarity", "id")[:limit]
+        )
+
+    matches = client_trigram_index.search(terms, limit)
+    clients = Client.objects.select_related("region").in_bulk([-client_id for _, client_id in matches])
+    result = []
+    for score, client_id in matches:
+        client = clients.get(-client_id)
+        if client:
+            client.similarity = score
+            result.append(client)
+    return result
@@ -1,9 +1,100 @@
+from django.contrib.auth.models import Group, User
+from django.db import transaction
 from django.dispatch import receiver
-from django.db.models.signals import post_delete
-from backend.models import Booking
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from backend.auth import USER_CACHES, clear_user_cache
+from backend.models import Booking, Available, Client, DailyOccupancy, Host
+from backend.search import client_trigram_index
 
 @receiver(post_delete, sender=Booking)
 def delete_booking_signal(sender, instance, **kwargs):
-    # Update available places when booking is deleted.
-    instance.calc_available()
-    
\ No newline at end of file
+    # Update available places and occupancy when booking is deleted.
+    Available.objects.apply_delta(instance.product, instance.occupied_nights(), 1)
+    DailyOccupancy.objects.apply_delta(
+        instance.product,
+        {day: {field: -n for field, n in counts.items()}
+         for day, counts in instance.occupancy_counts().items()},
+    )
+
+
+@receiver(post_save, sender=Client)
+def client_saved_signal(sender, instance, **kwargs):
+    # Keep the in-memory trigram index for fuzzy guest search up to date,
+    # once the change is committed.
+    transaction.on_commit(lambda: client_trigram_index.update(instance))
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted_signal(sender, instance, **kwargs):
+    client_id = instance.id
+    transaction.on_commit(lambda: client_trigram_index.remove(client_id))
+
+
+def user_cache_changed(user_ids, names=USER_CACHES):
+    # Clear cached user data now and again after commit, so a request
+    # reading the old data before the commit can't keep it cached.
+    user_ids = list(user_ids)
+    clear_user_cache(user_ids, names)
+    transaction.on_commit(lambda: clear_user_cache(user_ids, names))
+
+
+def m2m_users_changed(instance, action, pk_set, user_is_instance, cache_name, related_users):
+    """
+    Clear cache_name for the users whose many-to-many relation changed.
+    related_users(instance) gives the users of a Group or Host instance.
+    """
+    if user_is_instance:
+        if action in ("post_add", "post_remove", "post_clear"):
+            instance.__dict__.pop(f"_{cache_name}", None)
+            user_cache_changed([instance.pk], [cache_name])
+    # clear() on a group or host doesn't tell which users were removed
+    elif action == "pre_clear":
+        instance._cleared_user_ids = list(related_users(instance).values_list("id", flat=True))
+    elif action == "post_clear":
+        user_cache_changed(instance.__dict__.pop("_cleared_user_ids", []), [cache_name])
+    elif action in ("post_add", "post_remove"):
+        user_cache_changed(pk_set, [cache_name])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed_signal(sender, instance, action, reverse, pk_set, **kwargs):
+    m2m_users_changed(instance, action, pk_set, not reverse, "user_groups", lambda group: group.user_set)
+
+
+@receiver(m2m_changed, sender=Host.users.through)
+def host_users_changed_signal(sender, instance, action, reverse, pk_set, **kwargs):
+    m2m_users_changed(instance, action, pk_set, reverse, "host_ids", lambda host: host.users)
+
+
+@receiver(m2m_changed, sender=Host.caseworkers.through)
+def host_caseworkers_changed_signal(sender, instance, action, reverse, pk_set, **kwargs):
+    m2m_users_changed(instance, action, pk_set, reverse, "caseworker_host_ids", lambda host: host.caseworkers)
+
+
+@receiver(pre_delete, sender=Host)
+def host_deleting_signal(sender, instance, **kwargs):
+    # The host's users are gone after the delete, so collect them first
+    instance._user_ids = list(instance.users.values_list("id", flat=True))
+    instance._caseworker_ids = list(instance.caseworkers.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Host)
+def host_deleted_signal(sender, instance, **kwargs):
+    user_cache_changed(instance.__dict__.pop("_user_ids", []), ["host_ids"])
+    user_cache_changed(instance.__dict__.pop("_caseworker_ids", []), ["caseworker_host_ids"])
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed_signal(sender, instance, **kwargs):
+    # Renamed or deleted group
+    if instance.pk:
+        user_cache_changed(instance.user_set.values_list("id", flat=True), ["user_groups"])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed_signal(sender, instance, created=True, **kwargs):
+    # A new user may reuse the id of a deleted user
+    if created:
+        user_cache_changed([instance.pk])
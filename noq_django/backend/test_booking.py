@@ -1,12 +1,17 @@
-from django.test import TestCase
+import threading
+from django.test import TestCase, TransactionTestCase
+from django.db import connection, DatabaseError
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from io import StringIO
 
 # Generated by CodiumAI
 from backend.models import Booking
-from datetime import datetime
+from datetime import date, datetime
 from backend.models import Product
 from backend.models import BookingStatus
 from backend.models import Available
+from backend.models import DailyOccupancy
 from datetime import timedelta
 from backend.models import Region, Client, User, Host, State
 
@@ -430,3 +435,379 @@ class test_Booking(TestCase):
                 ).first()
                 assert availability is not None
                 self.assertEqual(availability.places_left, expected_result[i][day_nr])
+
+    def test_bookings_count_per_date_is_single_query(self):
+        '''
+        Counting bookings per date should cost one query regardless
+        of the length of the stay.
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+
+        booking = Booking(
+            start_date=test_date,
+            end_date=test_date + timedelta(days=30),
+            product=booked_product,
+            user=Client.objects.get(gender="K"),
+            status=BookingStatus.objects.get(id=State.PENDING),
+        )
+        with self.assertNumQueries(1):
+            bookings_per_date = booking.bookings_count_per_date()
+
+        self.assertEqual(len(bookings_per_date), 30)
+        expected_count = [2, 3, 4, 5, 4, 3, 2, 1, 0]
+        for i, count in enumerate(expected_count):
+            day = f"{test_date + timedelta(days=i):%Y-%m-%d}"
+            self.assertEqual(bookings_per_date[day], count)
+
+    def test_calc_available_query_count_independent_of_stay_length(self):
+        '''
+        Updating availability for a long stay should not cost one
+        round trip per night.
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+
+        booking = Booking()
+        booking.start_date = test_date
+        booking.end_date = test_date + timedelta(days=30)
+        booking.product = booked_product
+        booking.user = Client.objects.get(gender="K")
+        booking.status = BookingStatus.objects.get(id=State.PENDING)
+        booking.save()
+
+        # Decline without save() so availability is stale, then
+        # recount: count and one upsert of all dates
+        Booking.objects.filter(id=booking.id).update(status=State.DECLINED)
+        with self.assertNumQueries(2):
+            booking.calc_available()
+
+        self.assertEqual(
+            Available.objects.filter(product=booked_product).count(), 30)
+        self.assertFalse(
+            Available.objects.filter(
+                product=booked_product, places_left__lt=5).exists())
+
+    def test_availability_is_updated_incrementally(self):
+        '''
+        Changing status or dates only moves the affected nights, and
+        Available rows for other nights are left untouched.
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+
+        booking = Booking.objects.get(user=Client.objects.get(id=2))
+        booking.status = BookingStatus.objects.get(id=State.DECLINED)
+        booking.save()
+        # Client 2 released days 0-5
+        expected_result = [4, 3, 2, 1, 2, 3, 3, 4]
+        for day_nr, places_left in enumerate(expected_result):
+            availability = Available.objects.get(
+                product=booked_product,
+                available_date=test_date + timedelta(days=day_nr))
+            self.assertEqual(availability.places_left, places_left)
+
+        # Move client 2 to days 6-8 as accepted, day 8 has no Available yet
+        booking.status = BookingStatus.objects.get(id=State.ACCEPTED)
+        booking.start_date = test_date + timedelta(days=6)
+        booking.end_date = test_date + timedelta(days=9)
+        booking.save()
+        expected_result = [4, 3, 2, 1, 2, 3, 2, 3, 4]
+        for day_nr, places_left in enumerate(expected_result):
+            availability = Available.objects.get(
+                product=booked_product,
+                available_date=test_date + timedelta(days=day_nr))
+            self.assertEqual(availability.places_left, places_left)
+
+    def test_recalc_available_command_repairs_drift(self):
+        '''
+        The recalc_available command recounts Available from the bookings
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+
+        # Introduce drift
+        Available.objects.filter(product=booked_product).update(places_left=5)
+        Available.objects.filter(
+            product=booked_product,
+            available_date=test_date + timedelta(days=3)).delete()
+
+        call_command("recalc_available", stdout=StringIO())
+
+        expected_result = [3, 2, 1, 0, 1, 2, 3, 4]
+        for day_nr, places_left in enumerate(expected_result):
+            availability = Available.objects.get(
+                product=booked_product,
+                available_date=test_date + timedelta(days=day_nr))
+            self.assertEqual(availability.places_left, places_left)
+
+
+    def test_nights_are_clipped_and_summed_in_the_database(self):
+        '''
+        Nights are clipped to the period and summed with one query
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+        start_date = test_date + timedelta(days=2)
+        end_date = test_date + timedelta(days=6)
+
+        nights = Booking.objects.with_nights(start_date, end_date).order_by("user_id")
+        self.assertEqual([booking.nights.days for booking in nights], [2, 4, 3, 4, 3])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Booking.objects.total_nights(start_date, end_date), 16)
+        self.assertEqual(Booking.objects.total_nights(test_date, test_date + timedelta(days=30)), 24)
+        self.assertEqual(Booking.objects.total_nights(test_date + timedelta(days=10), test_date + timedelta(days=30)), 0)
+
+        per_host = list(Booking.objects.nights_per(start_date, end_date, "product__host__name"))
+        self.assertEqual(per_host[0]["product__host__name"], "Host")
+        self.assertEqual(per_host[0]["total_nights"].days, 16)
+
+        Booking.objects.filter(user_id__in=[1, 2]).update(status=State.COMPLETED)
+        out = StringIO()
+        call_command("nights_report", str(start_date), str(end_date - timedelta(days=1)),
+                     "--group-by", "region", stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ["product__host__region__name,nights", "City,6"])
+
+    def occupancy(self, product):
+        # As reported, with no-shows only before today
+        rows = DailyOccupancy.objects.filter(product=product).per_date(date.min, date.max)
+        return {
+            row["date"]: (row["occupied"], row["arrivals"], row["departures"], row["no_shows"])
+            for row in rows
+            if (row["occupied"], row["arrivals"], row["departures"], row["no_shows"]) != (0, 0, 0, 0)
+        }
+
+    def test_daily_occupancy_is_updated_incrementally(self):
+        '''
+        DailyOccupancy follows the bookings and matches a full rebuild
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+
+        occupied = [2, 3, 4, 5, 4, 3, 2, 1]
+        self.assertEqual(
+            self.occupancy(booked_product),
+            {test_date + timedelta(days=i): (n, 0, 0, 0) for i, n in enumerate(occupied)})
+
+        # Client 2 checks in, client 5 is reserved, client 1 is declined
+        bookings = {booking.user_id: booking for booking in Booking.objects.filter(product=booked_product)}
+        for user_id, status in [(2, State.CHECKED_IN), (5, State.RESERVED), (1, State.DECLINED)]:
+            bookings[user_id].status_id = status
+            bookings[user_id].save()
+        # Client 3 cancels
+        bookings[3].delete()
+
+        expected = {test_date + timedelta(days=i): (n, 0, 0, 0) for i, n in enumerate([2, 2, 3, 3, 3, 2, 1])}
+        expected[test_date] = (2, 1, 0, 0)
+        # Client 5's reservation starts in two days, not a no-show yet
+        expected[test_date + timedelta(days=2)] = (3, 0, 0, 0)
+        expected[test_date + timedelta(days=6)] = (1, 0, 1, 0)
+        self.assertEqual(self.occupancy(booked_product), expected)
+
+        # The rebuild gives the same result
+        DailyOccupancy.objects.all().delete()
+        call_command("rebuild_occupancy", stdout=StringIO())
+        self.assertEqual(self.occupancy(booked_product), expected)
+
+        per_date = DailyOccupancy.objects.filter(host=booked_product.host).per_date(
+            test_date, test_date + timedelta(days=3))
+        self.assertEqual([row["occupied"] for row in per_date], [2, 2, 3])
+
+    def test_no_shows_are_counted_after_the_start_date(self):
+        '''
+        A reserved booking the guest never checked in on is a no-show once
+        its start date has passed
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+        bookings = {booking.user_id: booking for booking in Booking.objects.filter(product=booked_product)}
+        for user_id in [1, 2]:
+            bookings[user_id].status_id = State.RESERVED
+            bookings[user_id].save()
+        self.assertEqual(self.occupancy(booked_product)[test_date], (2, 0, 0, 0))
+
+        # Client 1's booking started two days ago
+        Booking.objects.filter(id=bookings[1].id).update(
+            start_date=test_date - timedelta(days=2), end_date=test_date - timedelta(days=1))
+        call_command("rebuild_occupancy", stdout=StringIO())
+        occupancy = self.occupancy(booked_product)
+        self.assertEqual(occupancy[test_date - timedelta(days=2)], (1, 0, 0, 1))
+        # Client 2's reservation starts today
+        self.assertEqual(occupancy[test_date], (2, 0, 0, 0))
+
+    def test_bulk_transition_matches_saving_each_booking(self):
+        '''
+        Booking transition updates all bookings with one UPDATE and gives
+        the same availability and occupancy as saving them one by one
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+
+        def places_left():
+            return list(Available.objects.filter(product=booked_product)
+                        .order_by("available_date").values_list("places_left", flat=True))
+
+        # Client 1 declined, clients 2 and 3 reserved
+        bookings = {booking.user_id: booking for booking in Booking.objects.filter(product=booked_product)}
+        bookings[1].status_id = State.DECLINED
+        bookings[1].save()
+        changed, errors = Booking.objects.filter(user_id__in=[2, 3]).transition(State.RESERVED)
+        self.assertEqual(sorted(booking.user_id for booking in changed), [2, 3])
+        self.assertEqual(errors, {})
+        self.assertEqual(changed[0].status.description, "reserved")
+        self.assertEqual(Booking.objects.filter(status_id=State.RESERVED).count(), 2)
+
+        expected_places = [3, 3, 2, 1, 1, 2, 3, 4]
+        expected_occupancy = self.occupancy(booked_product)
+        # Reservations from today on are not no-shows yet
+        expected_occupancy[test_date] = (2, 0, 0, 0)
+        expected_occupancy[test_date + timedelta(days=3)] = (4, 0, 0, 0)
+        self.assertEqual(places_left(), expected_places)
+        self.assertEqual(self.occupancy(booked_product), expected_occupancy)
+
+        # Decline clients 4 and 5 in bulk, places are released
+        changed, errors = Booking.objects.filter(user_id__in=[4, 5]).transition(State.DECLINED)
+        self.assertEqual(len(changed), 2)
+        self.assertEqual(places_left(), [4, 4, 4, 3, 3, 3, 4, 4])
+
+        # The recount and rebuild give the same result
+        occupancy = self.occupancy(booked_product)
+        call_command("recalc_available", stdout=StringIO())
+        DailyOccupancy.objects.all().delete()
+        call_command("rebuild_occupancy", stdout=StringIO())
+        self.assertEqual(places_left(), [4, 4, 4, 3, 3, 3, 4, 4])
+        self.assertEqual(self.occupancy(booked_product), occupancy)
+
+    def test_bulk_transition_validates_in_memory(self):
+        '''
+        Bookings that can't get the new status are returned as errors and
+        are not changed
+        '''
+        booked_product = Product.objects.get(total_places=5)
+        test_date = datetime.now().date()
+        self.create_five_bookings(test_date, booked_product)
+        bookings = {booking.user_id: booking for booking in Booking.objects.filter(product=booked_product)}
+
+        # Started yesterday
+        Booking.objects.filter(id=bookings[2].id).update(start_date=test_date - timedelta(days=1))
+
+        # Two declined bookings want the same last free place
+        booked_product.total_places = 4
+        booked_product.save()
+        for user_id in [1, 5]:
+            bookings[user_id].status_id = State.DECLINED
+            bookings[user_id].save()
+
+        # Locks, bookings, places per date, one UPDATE for all bookings
+        # and the counters
+        BookingStatus.objects.get_state(State.PENDING)
+        with self.assertNumQueries(10):
+            changed, errors = Booking.objects.filter(user_id__in=[1, 2, 5]).transition(State.PENDING)
+        self.assertEqual([booking.user_id for booking in changed], [1])
+        self.assertEqual(errors, {
+            bookings[2].id: "Fel: Bokningen börjar före dagens datum!",
+            bookings[5].id: "Fullbokat rum",
+        })
+        self.assertEqual(
+            dict(Booking.objects.filter(product=booked_product).values_list("user_id", "status_id")),
+            {1: State.PENDING, 2: State.PENDING, 3: State.PENDING, 4: State.PENDING, 5: State.DECLINED})
+
+    def test_booking_status_lookup_is_cached(self):
+        '''
+        BookingStatus.objects.get_state only queries the database once
+        '''
+        BookingStatus.objects.clear_cache()
+        with self.assertNumQueries(1):
+            BookingStatus.objects.get_state(State.PENDING)
+            BookingStatus.objects.get_state(State.DECLINED)
+        with self.assertNumQueries(0):
+            self.assertEqual(BookingStatus.objects.get_state(State.PENDING).id, State.PENDING)
+
+        with self.assertRaises(BookingStatus.DoesNotExist):
+            BookingStatus.objects.get_state(99)
+
+
+class test_BookingConcurrency(TransactionTestCase):
+    '''
+    Parallel booking requests for the same product must never book more
+    places than the product has.
+    '''
+    nr_of_requests = 8
+
+    def setUp(self):
+        region = Region.objects.create(name="City")
+        host = Host.objects.create(name="Host", city="City", region=region)
+        self.product = Product.objects.create(
+            name="Product",
+            description="Description",
+            total_places=3,
+            host=host,
+            type="room",
+        )
+        for status in State:
+            BookingStatus.objects.get_or_create(
+                id=status, defaults={"description": status.name.lower()})
+
+        for i in range(self.nr_of_requests):
+            user = User.objects.create(username="guest_" + str(i))
+            Client.objects.create(
+                first_name="Guest" + str(i),
+                last_name="Doe",
+                gender="K",
+                region=region,
+                last_edit=datetime.now().date(),
+                user=user,
+            )
+
+    def request_booking(self, client, barrier, results):
+        try:
+            booking = Booking(
+                start_date=datetime.now().date(),
+                end_date=(datetime.now() + timedelta(days=5)).date(),
+                product=Product.objects.get(id=self.product.id),
+                user=client,
+                status=BookingStatus.objects.get(id=State.PENDING),
+            )
+            barrier.wait()
+            booking.save()
+            results.append("booked")
+        except ValidationError:
+            results.append("full")
+        except DatabaseError:
+            # e.g. SQLite refusing a concurrent writer
+            results.append("error")
+        finally:
+            connection.close()
+
+    def test_parallel_requests_do_not_overbook(self):
+        barrier = threading.Barrier(self.nr_of_requests)
+        results = []
+        threads = [
+            threading.Thread(target=self.request_booking, args=(client, barrier, results))
+            for client in Client.objects.all()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.nr_of_requests)
+        booked = Booking.objects.filter(product=self.product).count()
+        self.assertEqual(booked, results.count("booked"))
+        self.assertLessEqual(booked, self.product.total_places)
+        if connection.features.has_select_for_update:
+            # With row locks every request is either booked or rejected
+            self.assertEqual(booked, self.product.total_places)
+
+        # Available must agree with the bookings that were saved
+        for availability in Available.objects.filter(product=self.product):
+            self.assertEqual(
+                availability.places_left, self.product.total_places - booked)
@@ -1,4 +1,5 @@
 import logging
+import unicodedata
 from datetime import datetime
 
 
@@ -38,3 +39,13 @@ def debug(*args):
         else:
             ret = ret + f"{arg} | "
     logger.debug(ret)
+
+
+def normalize_string(text):
+    """
+    Gemener utan accenter, t.ex. "Åsa Öberg" -> "asa oberg", för sökning.
+    Bara accenterna (kombinerande tecken) tas bort, övriga bokstäver behålls:
+    "Мария" -> "мария", "Łukasz" -> "łukasz", "Straße" -> "strasse"
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if unicodedata.category(c) != 'Mn').casefold()
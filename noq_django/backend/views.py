@@ -21,8 +21,8 @@ from django.views.decorators.http import require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from .models import Resource
 from django.db.models import Q
+from django.db.models.functions import Lower
 from .models import APPLIES_TO_OPTIONS
-import unicodedata
 
 
 
@@ -497,9 +497,6 @@ problem_areas = [
 
 
 
-def normalize_string(text):
-    return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8').lower()
-
 def resource_list(request):
     search_query = request.GET.get("search", "")
     sort = request.GET.get("sort", "")
@@ -512,62 +509,29 @@ def resource_list(request):
 
     # Apply normalized keyword search first
     if search_query:
-        normalized_search = normalize_string(search_query)
-        filtered_by_search = []
-
-        for r in resources:
-            fields_to_search = [
-                r.name, r.address, r.email, r.phone,
-                r.other, r.target_group
-            ]
-
-            # Add applies_to list or comma-separated string
-            if isinstance(r.applies_to, list):
-                fields_to_search.extend(r.applies_to)
-            elif isinstance(r.applies_to, str):
-                fields_to_search.extend([val.strip() for val in r.applies_to.split(",")])
-
-            # Normalize and search
-            searchable_text = " ".join([normalize_string(str(f)) for f in fields_to_search])
-            if normalized_search in searchable_text:
-                filtered_by_search.append(r)
-
-        resources = filtered_by_search
+        resources = resources.search(search_query)
 
     #  Filter by target group
     if target_group_filter:
-        # resources = resources.filter(target_group__in=target_group_filter)
-        resources = [r for r in resources if r.target_group in target_group_filter]
-
-    #  Apply remaining filters
-    filtered_resources = []
-    for r in resources:
-        # EU filter
-        # if eu_citizen and "EU" not in r.address:
-        #     continue
-
-        # Applies to (problem area)
-        if applies_to_filter:
-            applies_to_vals = r.applies_to
-            if isinstance(applies_to_vals, str):
-                applies_to_vals = [val.strip() for val in applies_to_vals.split(",")]
-            if not any(tag in applies_to_vals for tag in applies_to_filter):
-                continue
-
-        # Open now
-        if open_now == "1" and not r.is_open_now():
-            continue
-
-        filtered_resources.append(r)
+        resources = resources.filter(target_group__in=target_group_filter)
+
+    # Applies to (problem area)
+    if applies_to_filter:
+        resources = resources.applies_to_any(applies_to_filter)
 
     #  Sort results
-    if sort in ['name', '-name']:
-        reverse = sort.startswith('-')
-        filtered_resources = sorted(filtered_resources, key=lambda r: r.name.lower(), reverse=reverse)
+    if sort == "name":
+        resources = resources.order_by(Lower("name"))
+    elif sort == "-name":
+        resources = resources.order_by(Lower("name").desc())
+
+    # Open now
+    if open_now == "1":
+        resources = resources.open_at()
 
     #  Return context to template
     return render(request, "resource_list.html", {
-        "resources": filtered_resources,
+        "resources": resources,
         "search": search_query,
         "sort": sort,
         "open_now": open_now,
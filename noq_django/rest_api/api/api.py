@@ -5,6 +5,7 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from ninja import NinjaAPI
 from backend.models import (Host, Client, Region)
+from backend.auth import user_group_names
 from django.contrib.auth.models import User, Group
 from django.db import transaction, IntegrityError
 from django.http import JsonResponse
@@ -64,7 +65,7 @@ def get(request):
     if not request.user.is_authenticated:
         return JsonResponse({"login_status": False, "message": "User not authenticated"}, status=401)
 
-    user_groups = [g.name for g in request.user.groups.all()]
+    user_groups = user_group_names(request.user)
     host = None
 
     if "host" in user_groups:
@@ -102,7 +103,7 @@ def login_user(request, payload: LoginPostSchema):
     user = authenticate(request, username=email, password=password)
     if user is not None:
         login(request, user)
-        user_groups = [g.name for g in request.user.groups.all()]
+        user_groups = user_group_names(request.user)
         host = None
 
         if "host" in user_groups:
@@ -47,6 +47,10 @@ class SimplifiedClientSchema(Schema):
     region_name: Optional[str] = None
 
 
+class ClientMatchSchema(SimplifiedClientSchema):
+    similarity: float
+
+
 class RegionSchema(ModelSchema):
     """
 
@@ -213,6 +217,23 @@ class BookingSchema(Schema):
     user: UserSchema
 
 
+def booking_schema_queryset(bookings):
+    """
+    Hämtar allt som BookingSchema serialiserar i samma fråga som
+    bokningarna, så att listor inte gör en fråga per rad och relation
+    """
+    return bookings.select_related(
+        "status", "product__host__region", "user__region"
+    ).only(
+        "id", "booking_time", "start_date", "end_date",
+        "status__description",
+        "product__name", "product__description", "product__total_places", "product__type",
+        "product__host__name", "product__host__street", "product__host__postcode",
+        "product__host__city", "product__host__region__name",
+        "user",
+    )
+
+
 class BookingPostSchema(Schema):
     """
     Booking för att boka en Product
@@ -296,6 +317,34 @@ class AvailablePerDateSchema(Schema):
     """
     available_dates: Dict[str, List[AvailableSchema]]
 
+class CalendarProductSchema(Schema):
+    """
+    En rad i kalendern med places_left per dag från start_date
+    """
+    id: int
+    name: str
+    type: str
+    total_places: int
+    places_left: List[int]
+
+class HostCalendarSchema(Schema):
+    """
+    Tillgängliga platser som matris produkt × datum
+    """
+    start_date: date
+    nr_of_days: int
+    products: List[CalendarProductSchema]
+
+class OccupancySchema(Schema):
+    """
+    Beläggning för en värd ett datum
+    """
+    date: date
+    occupied: int
+    arrivals: int
+    departures: int
+    no_shows: int
+
 class AvailableProductsSchema(Schema):
     host: HostSchema
     products: List[ProductSchemaWithPlacesLeft]
@@ -369,6 +418,16 @@ class UserShelterStayCountSchema(Schema):
     user_stay_counts: List[UserStaySummarySchema]
 
 
+class UserShelterStayTotalSchema(UserShelterStayCountSchema):
+    """
+    En användares övernattningar per sida, med totalt antal nätter för
+    hela perioden
+    """
+    total_nights: int
+    total_pages: int
+    current_page: int
+
+
 class ForgotPasswordSchema(Schema):
     """
     Schema för att begära en återställning av lösenordet.
@@ -403,6 +462,18 @@ class ResourceSchema(Schema):
     applies_to: List[str]
     is_open_now: bool
 
+    @staticmethod
+    def resolve_opening_time(obj):
+        return obj.opening_time.strftime("%H:%M:%S")
+
+    @staticmethod
+    def resolve_closing_time(obj):
+        return obj.closing_time.strftime("%H:%M:%S")
+
+    @staticmethod
+    def resolve_is_open_now(obj):
+        return obj.is_open_now()
+
 
 class ResourcePostSchema(Schema):
     """
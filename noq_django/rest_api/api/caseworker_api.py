@@ -1,11 +1,14 @@
 from ninja import Router
+from ninja.pagination import paginate
 from ninja.errors import HttpError
 from django.db import transaction
 from datetime import date
-from django.http import JsonResponse
-from backend.auth import group_auth
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from backend.auth import caseworker_auth
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
+from django.db.models import Min
 from django.contrib.auth.models import User, Group
 from typing import List, Optional
 from django.shortcuts import get_object_or_404
@@ -19,63 +22,61 @@ from backend.models import (
     Available,
     Product,
     BookingStatus,
+    State,
 )
 
+from .pagination import CursorPagination
+
 from .api_schemas import (
     BookingSchema,
     BookingUpdateSchema,
     ProductSchemaWithPlacesLeft,
     UserStaySummarySchema,
     UserShelterStayCountSchema,
-    UserInfoSchema
+    UserShelterStayTotalSchema,
+    UserInfoSchema,
+    booking_schema_queryset,
 )
 
 
-router = Router(auth=lambda request: group_auth(request, "caseworker"))  # request defineras vid call, gruppnamnet är statiskt
+router = Router(auth=lambda request: caseworker_auth(request))  # request defineras vid call, sätter request.caseworker_host_ids
 
 @router.get("/bookings/pending", response=List[BookingSchema], tags=["caseworker-manage-requests"])
-def get_pending_bookings(request, limiter: Optional[int] = None):  # Limiter example /pending?limiter=10 for 10 results, empty returns all
-    hosts = Host.objects.filter(caseworkers=request.user)
-    bookings = []
-    for host in hosts:
-        host_bookings = Booking.objects.filter(product__host=host, status__description='pending')
-        for booking in host_bookings:
-            bookings.append(booking)
-
-    if limiter is not None and limiter > 0:
-        return bookings[:limiter]
+@paginate(CursorPagination, ordering=("start_date", "id"))
+def get_pending_bookings(request):  # Page size example /pending?page_size=10, next page with ?cursor=<next_cursor>
+    bookings = booking_schema_queryset(Booking.objects.filter(
+        product__host_id__in=request.caseworker_host_ids,
+        status_id=State.PENDING,
+    ))
 
     return bookings
 
 
 @router.patch("/bookings/batch/accept", response={200: dict, 400: dict}, tags=["caseworker-manage-requests"])
 def batch_appoint_pending_booking(request, booking_ids: list[BookingUpdateSchema]):
-    hosts = Host.objects.filter(caseworkers=request.user)
-    # Use a transaction to ensure all or nothing behavior
+    ids = {item.booking_id for item in booking_ids}
+    # Use a transaction to ensure all or nothing behavior if a booking is missing
     with transaction.atomic():
-        errors = []
-        for item in booking_ids:
-            booking_id = item.booking_id
-            booking = get_object_or_404(Booking, id=booking_id, product__host__in=hosts, status__description='pending')
-            try:
-                booking.status = BookingStatus.objects.get(description='accepted')
-                booking.save()
-            except Exception as e:
-                # Collect errors for any failed updates
-                errors.append({'booking': item.booking_id, 'error': str(e)})
-        if errors:
-            return 400, {'message': 'Some updates failed', 'errors': errors}
+        bookings, errors = Booking.objects.filter(
+            id__in=ids, product__host_id__in=request.caseworker_host_ids, status_id=State.PENDING
+        ).transition(State.ACCEPTED)
+        if ids - {booking.id for booking in bookings} - errors.keys():
+            raise Http404("No Booking matches the given query.")
+
+    if errors:
+        # Collect errors for any failed updates
+        return 400, {'message': 'Some updates failed',
+                     'errors': [{'booking': booking_id, 'error': error} for booking_id, error in errors.items()]}
 
     return 200, {'message': 'Batch update successful'}
 
 
 @router.patch("/bookings/{booking_id}/accept", response=BookingSchema, tags=["caseworker-manage-requests"])
 def appoint_pending_booking(request, booking_id: int):
-    hosts = Host.objects.filter(caseworkers=request.user)
-    booking = get_object_or_404(Booking, id=booking_id, product__host__in=hosts, status__description='pending')
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.caseworker_host_ids, status_id=State.PENDING)
 
     try:
-        booking.status = BookingStatus.objects.get(description='accepted')
+        booking.status = BookingStatus.objects.get_state(State.ACCEPTED)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -84,11 +85,10 @@ def appoint_pending_booking(request, booking_id: int):
 
 @router.patch("/bookings/{booking_id}/decline", response=BookingSchema, tags=["caseworker-manage-requests"])
 def decline_pending_booking(request, booking_id: int):
-    hosts = Host.objects.filter(caseworkers=request.user)
-    booking = get_object_or_404(Booking, id=booking_id, product__host__in=hosts, status__description='pending')
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.caseworker_host_ids, status_id=State.PENDING)
 
     try:
-        booking.status = BookingStatus.objects.get(description='advised_against')
+        booking.status = BookingStatus.objects.get_state(State.ADVISED_AGAINST)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -99,12 +99,11 @@ def decline_pending_booking(request, booking_id: int):
 # Bookings that have status checked_in can't be changed.
 @router.patch("/bookings/{booking_id}/setpending", response=BookingSchema, tags=["caseworker-manage-requests"])
 def set_booking_pending(request, booking_id: int):
-    hosts = Host.objects.filter(caseworkers=request.user)
-    valid_statuses = ['accepted', 'declined']
-    booking = get_object_or_404(Booking, id=booking_id, product__host__in=hosts, status__description__in=valid_statuses)
+    valid_statuses = [State.ACCEPTED, State.DECLINED]
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.caseworker_host_ids, status_id__in=valid_statuses)
 
     try:
-        booking.status = BookingStatus.objects.get(description='pending')
+        booking.status = BookingStatus.objects.get_state(State.PENDING)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -113,45 +112,25 @@ def set_booking_pending(request, booking_id: int):
 
 @router.get("/available_all", response=List[ProductSchemaWithPlacesLeft], tags=["caseworker-available"])
 def get_available_places_all(request):
-    # Retrieve all hosts the caseworker is responsible for
-    hosts = Host.objects.filter(caseworkers=request.user)  # Assuming caseworkers are linked to Hosts via the 'users' relationship
-    
-    if not hosts.exists():
+    """
+    Products of all hosts the caseworker is responsible for, with the
+    number of places left today.
+    """
+    if not request.caseworker_host_ids:
         # No hosts associated with the caseworker, return a 404 error
         raise HttpError(404, "No hosts associated with this caseworker.")
-    
-    available_products = []
-    
-    # Loop through each host and get the products
-    for host in hosts:
-        products = Product.objects.filter(host=host)
-        
-        # Loop through each product and check available places
-        for product in products:
-            # Find availability for the product
-            available = Available.objects.filter(product=product).first()
-            
-            # Calculate the number of places left
-            places_left = available.places_left if available else product.total_places
-            
-            # Append the product with the remaining places to the list
-            available_products.append(
-                ProductSchemaWithPlacesLeft(
-                    id=product.id,
-                    name=product.name,
-                    description=product.description,
-                    total_places=product.total_places,
-                    host=product.host,  
-                    type=product.type,
-                    places_left=places_left
-                )
-            )
-    
-    # Return the full list of available products across all hosts
+
+    available_products = (
+        Product.objects.filter(host_id__in=request.caseworker_host_ids)
+        .select_related("host__region")
+        .with_places_left(timezone.now().date())
+        .order_by("host_id", "id")
+    )
+
     return available_products
 
 
-@router.get("/guests/nights/count/{user_id}/{start_date}/{end_date}", response={400: dict, 200: UserShelterStayCountSchema}, tags=["caseworker-statistics"])
+@router.get("/guests/nights/count/{user_id}/{start_date}/{end_date}", response={400: dict, 200: UserShelterStayTotalSchema}, tags=["caseworker-statistics"])
 def get_user_shelter_stay_count(request, user_id: int, start_date: str, end_date: str, page: int = 1, per_page: int = 20):
     try:
 
@@ -165,50 +144,45 @@ def get_user_shelter_stay_count(request, user_id: int, start_date: str, end_date
 
         user = User.objects.get(id=user_id)
 
-        user_bookings = Booking.objects.filter(
-            user_id=client,
-            start_date__lte=end_date,
-            end_date__gte=start_date
-        ).select_related(
+        user_bookings = Booking.objects.filter(user_id=client)
+
+        page_bookings = user_bookings.with_nights(start_date, end_date).select_related(
             'product__host__region'
         ).only(
             'start_date', 'end_date', 'product__host__id', 'product__host__name',
             'product__host__street', 'product__host__postcode', 'product__host__city', 'product__host__region__id',
             'product__host__region__name'
-        )
+        ).order_by('start_date', 'id')
 
-        paginator = Paginator(user_bookings, per_page)
+        paginator = Paginator(page_bookings, per_page)
         user_stay_counts_page = paginator.get_page(page)
 
-        total_nights = 0
+        # Total for the whole period, not only the current page
+        total_nights = user_bookings.total_nights(start_date, end_date)
         user_stay_counts = []
 
         for booking in user_stay_counts_page:
-            nights = (min(booking.end_date, end_date) - max(booking.start_date, start_date)).days
-            if nights > 0:
-                total_nights += nights
-
-                host = booking.product.host  
-                host_data = {
-                    'id': host.id,
-                    'name': host.name,
-                    'street': host.street,
-                    'postcode': host.postcode,
-                    'city': host.city,
-                    'region': {
-                        'id': host.region.id,
-                        'name': host.region.name
-                    },
-                }
+            host = booking.product.host
+            host_data = {
+                'id': host.id,
+                'name': host.name,
+                'street': host.street,
+                'postcode': host.postcode,
+                'city': host.city,
+                'region': {
+                    'id': host.region.id,
+                    'name': host.region.name
+                },
+            }
 
-                user_stay_counts.append(
-                    UserStaySummarySchema(
-                        total_nights=nights,
-                        start_date=booking.start_date.isoformat(),
-                        end_date=booking.end_date.isoformat(),
-                        host=host_data
-                    )
+            user_stay_counts.append(
+                UserStaySummarySchema(
+                    total_nights=booking.nights.days,
+                    start_date=booking.start_date.isoformat(),
+                    end_date=booking.end_date.isoformat(),
+                    host=host_data
                 )
+            )
 
         response_data = {
             "user_id": user_id,
@@ -235,14 +209,26 @@ def get_shelter_stay_count(request, start_date: str, end_date: str, page: int =
         start_date = date.fromisoformat(start_date)
         end_date = date.fromisoformat(end_date)
 
-        bookings = Booking.objects.filter(
-            start_date__gte=start_date, end_date__lte=end_date).select_related('user', 'user__user', 'product__host')
+        bookings = Booking.objects.filter(start_date__gte=start_date, end_date__lte=end_date)
+
+        # Page over the users in the database, in order of their first booking
+        users = bookings.values("user__user_id").annotate(first_booking=Min("id")).order_by("first_booking")
+        paginator = Paginator(users, per_page)
+        user_stay_counts_page = paginator.get_page(page)
+        user_ids = [user["user__user_id"] for user in user_stay_counts_page.object_list]
+
+        # Fetch only the bookings for the users on this page
+        page_bookings = bookings.filter(user__user_id__in=user_ids).with_nights(
+            start_date, end_date
+        ).select_related(
+            'user', 'product__host__region'
+        ).order_by("id")
 
         # Group data by user in a dictionary
         user_data = {}
-        for booking in bookings:
+        for booking in page_bookings:
             client = booking.user
-            user_id = client.user.id
+            user_id = client.user_id
             host = booking.product.host
             host_data = {
                 'id': host.id,
@@ -256,9 +242,6 @@ def get_shelter_stay_count(request, start_date: str, end_date: str, page: int =
                 },
             }
 
-            # Calculate total nights
-            total_nights = (min(booking.end_date, end_date) - max(booking.start_date, start_date)).days
-
             # Initialize user data if not present
             if user_id not in user_data:
                 user_data[user_id] = {
@@ -270,19 +253,13 @@ def get_shelter_stay_count(request, start_date: str, end_date: str, page: int =
 
             # Append each stay summary for the user
             user_data[user_id]["user_stay_counts"].append({
-                "total_nights": total_nights,
+                "total_nights": booking.nights.days,
                 "start_date": booking.start_date,
                 "end_date": booking.end_date,
                 "host": host_data
             })
 
-        # Convert the grouped dictionary to a list for pagination
-        grouped_data = list(user_data.values())
-
-        paginator = Paginator(grouped_data, per_page)
-        user_stay_counts_page = paginator.get_page(page)
-
-        return user_stay_counts_page.object_list
+        return [user_data[user_id] for user_id in user_ids]
 
     except ValueError as ve:
         return JsonResponse({'detail': "Something went wrong"}, status=400)
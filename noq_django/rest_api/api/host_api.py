@@ -1,8 +1,10 @@
-from django.db.models import Q
+from django.db.models import Q, Count
 from ninja import Router
+from ninja.pagination import paginate
 from ninja.errors import HttpError
 from datetime import datetime, timedelta
 from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
 from django.contrib.auth.models import User, Group
 
@@ -14,6 +16,8 @@ from backend.models import (
     Available,
     Product,
     BookingStatus,
+    State,
+    DailyOccupancy,
     Invoice,
     InvoiceStatus,
 )
@@ -28,185 +32,212 @@ from .api_schemas import (
     InvoiceCreateSchema,
     InvoiceResponseSchema,
     BookingUpdateSchema,
-    VolunteersSchema
+    VolunteersSchema,
+    HostCalendarSchema,
+    OccupancySchema,
+    booking_schema_queryset,
 )
 
-from backend.auth import group_auth
+from backend.auth import host_auth
+from .pagination import CursorPagination
+from .streaming import json_array_chunks
 
 from typing import List, Dict, Optional
 from django.shortcuts import get_object_or_404
 from datetime import date, timedelta
 
-router = Router(auth=lambda request: group_auth(request, "host"))  # request defineras vid call, gruppnamnet är statiskt
+router = Router(auth=lambda request: host_auth(request))  # request defineras vid call, sätter request.host_ids
+
+# Longest window for the availability calendar, longer windows are streamed
+CALENDAR_MAX_DAYS = 366
+CALENDAR_STREAM_DAYS = 62
 
 # api/host/ returns the host information
 @router.get("/", response=HostSchema, tags=["host-frontpage"])
 def get_host_data(request):
     try:
-        host = Host.objects.get(users=request.user)
+        host = Host.objects.select_related("region").get(id__in=request.host_ids)
         return host
     except Host.DoesNotExist:
         raise HttpError(200, "User is not admin to a host.")
 
 @router.get("/count_bookings", response=BookingCounterSchema, tags=["host-frontpage"])
 def count_bookings(request):
-    host = Host.objects.get(users=request.user)
 
     # Get current date
     current_date = timezone.now().date()
 
-    # Count only bookings that have a start date today or in the future
-    pending_count = Booking.objects.filter(
-        product__host=host,
-        status__description__in=['pending', 'advised_against', 'accepted'],
-        start_date__gte=current_date  # Only count bookings with start dates today or in the future
-    ).count()
-
-    arrivals_count = Booking.objects.filter(
-        product__host=host,
-        start_date=date.today()
-    ).exclude(status__description__in=['completed', 'declined', 'checked_in']).count()
-    departures_count = Booking.objects.filter(product__host=host, status__description='checked_in',
-                                              end_date=date.today()).count()
-    current_guests_count = Booking.objects.filter(product__host=host, status__description='checked_in').count()
-
-    spots = Product.objects.filter(host=host, total_places__gt=0)
-    available_products = {}
-    for i in spots:
-        available = Available.objects.filter(product=i).first()
-        if available is not None and available.places_left > 0:
-            available_products[i.type] = available_products.get(i.type, 0) + 1
+    # All counters in one query using conditional aggregation
+    counters = Booking.objects.filter(product__host_id__in=request.host_ids).aggregate(
+        # Count only bookings that have a start date today or in the future
+        pending_count=Count("id", filter=Q(
+            status_id__in=[State.PENDING, State.ADVISED_AGAINST, State.ACCEPTED],
+            start_date__gte=current_date,
+        )),
+        arrivals_count=Count("id", filter=Q(start_date=current_date) & ~Q(
+            status_id__in=[State.COMPLETED, State.DECLINED, State.CHECKED_IN]
+        )),
+        departures_count=Count("id", filter=Q(status_id=State.CHECKED_IN, end_date=current_date)),
+        current_guests_count=Count("id", filter=Q(status_id=State.CHECKED_IN)),
+    )
+
+    # Products with places left today, grouped per product type
+    available_products = dict(
+        Product.objects.filter(host_id__in=request.host_ids, total_places__gt=0)
+        .with_places_left(current_date)
+        .filter(places_left__gt=0)
+        .values("type")
+        .annotate(count=Count("id"))
+        .values_list("type", "count")
+    )
 
     return BookingCounterSchema(
-        pending_count=pending_count,
-        arrivals_count=arrivals_count,
-        departures_count=departures_count,
-        current_guests_count=current_guests_count,
+        **counters,
         available_products=available_products
     )
 
+def check_calendar_days(nr_of_days):
+    if nr_of_days < 1 or nr_of_days > CALENDAR_MAX_DAYS:
+        raise HttpError(400, f"nr_of_days must be between 1 and {CALENDAR_MAX_DAYS}.")
+
+
 @router.get("/available/{nr_of_days}", response=AvailablePerDateSchema, tags=["host-frontpage"])
 def get_available_places(request, nr_of_days: int):
-    host = Host.objects.get(users=request.user)
+    check_calendar_days(nr_of_days)
     current_date = datetime.today().date()
-    # Dictionary with product name : available places
-    available_places = {}
-    products = Product.objects.filter(host_id=host)
-    for day in range(nr_of_days):
-        available_for_day = []
-        available_date = current_date + timedelta(days=day)
-        # Exclude bookings with status declined and in_queue
-        for product in products:
-            available = Available.objects.filter(
-                product=product,
-                available_date=available_date
-            ).first()
-
-            if available:
-                places_left = available.places_left
-            else:
-                places_left = product.total_places
-
-            available_for_day.append(
+    dates = [current_date + timedelta(days=day) for day in range(nr_of_days)]
+    # Dictionary with date : available places per product
+    available_places = {str(available_date): [] for available_date in dates}
+    products = Product.objects.filter(host_id__in=request.host_ids).select_related("host__region")
+    for product, places_left in Available.objects.calendar(products, current_date, nr_of_days):
+        for available_date, places in zip(dates, places_left):
+            available_places[str(available_date)].append(
                 AvailableSchema(
                     id=product.id,
                     available_date=available_date,
                     product=product,
-                    places_left=places_left
+                    places_left=places
                 )
             )
-        available_places[str(available_date)] = available_for_day
     return AvailablePerDateSchema(available_dates=available_places)
 
 
+@router.get("/calendar", response=HostCalendarSchema, tags=["host-frontpage"])
+def get_calendar(request, nr_of_days: int = 30, start_date: Optional[date] = None):
+    """
+    Places left per product and date as a compact matrix. Long windows are
+    streamed one product at a time.
+    """
+    check_calendar_days(nr_of_days)
+    start_date = start_date or timezone.now().date()
+    rows = Available.objects.calendar(Product.objects.filter(host_id__in=request.host_ids), start_date, nr_of_days)
+
+    def calendar_row(product, places_left):
+        return {
+            "id": product.id,
+            "name": product.name,
+            "type": product.type,
+            "total_places": product.total_places,
+            "places_left": places_left,
+        }
+
+    if nr_of_days <= CALENDAR_STREAM_DAYS:
+        return HostCalendarSchema(
+            start_date=start_date,
+            nr_of_days=nr_of_days,
+            products=[calendar_row(*row) for row in rows],
+        )
+
+    def stream():
+        yield '{"start_date": "%s", "nr_of_days": %d, "products": ' % (start_date.isoformat(), nr_of_days)
+        yield from json_array_chunks((calendar_row(*row) for row in rows), chunk_size=50)
+        yield "}"
+
+    return StreamingHttpResponse(stream(), content_type="application/json")
+
+
+@router.get("/occupancy", response=List[OccupancySchema], tags=["host-statistics"])
+def get_occupancy(request, start_date: date, end_date: date):
+    """
+    Occupied places, arrivals, departures and no-shows per date from
+    start_date up to end_date (not included). No-shows are only reported
+    for dates before today.
+    """
+    return DailyOccupancy.objects.filter(host_id__in=request.host_ids).per_date(start_date, end_date)
+
+
 @router.get("/bookings/incoming", response=List[BookingSchema], tags=["host-frontpage"])
-def get_incoming_bookings(request, limiter: Optional[int] = None):
-    host = Host.objects.get(users=request.user)
+@paginate(CursorPagination, ordering=("start_date", "id"))
+def get_incoming_bookings(request):
     current_date = timezone.now().date()
-    bookings = (Booking.objects.filter(
-        product__host=host,
+    bookings = booking_schema_queryset(Booking.objects.filter(
+        product__host_id__in=request.host_ids,
         start_date=current_date
-    ).exclude(status__description='checked_in')
-     .exclude(status__description='declined')
-     .exclude(status__description='completed'))
-
-    if limiter is not None and limiter > 0:
-        return bookings[:limiter]
+    ).exclude(status_id__in=[State.CHECKED_IN, State.DECLINED, State.COMPLETED]))
 
     return bookings
 
 
 @router.get("/bookings/outgoing", response=List[BookingSchema], tags=["host-frontpage"])
-def get_outgoing_bookings(request, limiter: Optional[int] = None):
-    host = Host.objects.get(users=request.user)
-    bookings = Booking.objects.filter(
-        product__host=host,
-        status__description='checked_in')
-
-    if limiter is not None and limiter > 0:
-        return bookings[:limiter]
+@paginate(CursorPagination, ordering=("start_date", "id"))
+def get_outgoing_bookings(request):
+    bookings = booking_schema_queryset(Booking.objects.filter(
+        product__host_id__in=request.host_ids,
+        status_id=State.CHECKED_IN))
 
     return bookings
 
 
 @router.get("/pending", response=List[BookingSchema], tags=["host-manage-requests"])
-def get_pending_bookings(request, limiter: Optional[
-    int] = None):  # Limiter example /pending?limiter=10 for 10 results, empty returns all
-    host = Host.objects.get(users=request.user)
-    status_list = ['pending', 'accepted', 'advised_against']
+@paginate(CursorPagination, ordering=("start_date", "id"))
+def get_pending_bookings(request):  # Page size example /pending?page_size=10, next page with ?cursor=<next_cursor>
+    status_list = [State.PENDING, State.ACCEPTED, State.ADVISED_AGAINST]
 
     # Get current date
     current_date = timezone.now().date()
 
-    bookings = Booking.objects.filter(
-        product__host=host,
-        status__description__in=status_list,
+    bookings = booking_schema_queryset(Booking.objects.filter(
+        product__host_id__in=request.host_ids,
+        status_id__in=status_list,
         start_date__gte=current_date
-    )
-
-    if limiter is not None and limiter > 0:
-        return bookings[:limiter]
+    ))
 
     return bookings
 
 
 @router.get("/pending/{booking_id}", response=BookingSchema, tags=["host-manage-requests"])
 def detailed_pending_booking(request, booking_id: int):
-    host = Host.objects.get(users=request.user)
-    booking = get_object_or_404(Booking, id=booking_id, product__host=host, status__description='pending')
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.host_ids, status_id=State.PENDING)
 
     return booking
 
 @router.patch("/pending/batch/accept", response={200: dict, 400: dict}, tags=["host-manage-requests"])
 def batch_appoint_pending_booking(request, booking_ids: list[BookingUpdateSchema]):
-    hosts = Host.objects.filter(users=request.user)
-    # Use a transaction to ensure all or nothing behavior
+    ids = {item.booking_id for item in booking_ids}
+    status_list = [State.PENDING, State.ACCEPTED, State.ADVISED_AGAINST]
+    # Use a transaction to ensure all or nothing behavior if a booking is missing
     with transaction.atomic():
-        errors = []
-        for item in booking_ids:
-            booking_id = item.booking_id
-            status_list = ['pending', 'accepted', 'advised_against']
-            booking = get_object_or_404(Booking, id=booking_id, product__host__in=hosts, status__description__in=status_list)
-            try:
-                booking.status = BookingStatus.objects.get(description='reserved')
-                booking.save()
-            except Exception as e:
-                # Collect errors for any failed updates
-                errors.append({'booking': item.booking_id, 'error': str(e)})
-        if errors:
-            return 400, {'message': 'Some updates failed', 'errors': errors}
+        bookings, errors = Booking.objects.filter(
+            id__in=ids, product__host_id__in=request.host_ids, status_id__in=status_list
+        ).transition(State.RESERVED)
+        if ids - {booking.id for booking in bookings} - errors.keys():
+            raise Http404("No Booking matches the given query.")
+
+    if errors:
+        # Collect errors for any failed updates
+        return 400, {'message': 'Some updates failed',
+                     'errors': [{'booking': booking_id, 'error': error} for booking_id, error in errors.items()]}
 
     return 200, {'message': 'Batch update successful'}
 
 
 @router.patch("/pending/{booking_id}/appoint", response=BookingSchema, tags=["host-manage-requests"])
 def appoint_pending_booking(request, booking_id: int):
-    host = Host.objects.get(users=request.user)
-    status_list = ['pending', 'accepted', 'advised_against']
-    booking = get_object_or_404(Booking, id=booking_id, product__host=host, status__description__in=status_list)
+    status_list = [State.PENDING, State.ACCEPTED, State.ADVISED_AGAINST]
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.host_ids, status_id__in=status_list)
 
     try:
-        booking.status = BookingStatus.objects.get(description='reserved')
+        booking.status = BookingStatus.objects.get_state(State.RESERVED)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -215,26 +246,21 @@ def appoint_pending_booking(request, booking_id: int):
 
 @router.patch("/pending/{booking_id}/decline", response=BookingSchema, tags=["host-manage-requests"])
 def decline_pending_booking(request, booking_id: int):
-    host = Host.objects.get(users=request.user)
-    status_list = ['pending', 'accepted', 'advised_against']
-    booking = get_object_or_404(Booking, id=booking_id, product__host=host, status__description__in=status_list)
+    status_list = [State.PENDING, State.ACCEPTED, State.ADVISED_AGAINST]
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.host_ids, status_id__in=status_list)
 
     try:
-        booking.status = BookingStatus.objects.get(description='declined')
+        booking.status = BookingStatus.objects.get_state(State.DECLINED)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
         raise HttpError(404, "Booking status does not exist.")
 
 
-@router.get("/bookings", response=BookingSchema, tags=["host-manage-bookings"])
-def get_all_bookings(request, limiter: Optional[
-    int] = None):  # Limiter example /pending?limiter=10 for 10 results, empty returns all
-    host = Host.objects.get(users=request.user)
-    bookings = Booking.objects.filter(product__host=host)
-
-    if limiter is not None and limiter > 0:
-        return bookings[:limiter]
+@router.get("/bookings", response=List[BookingSchema], tags=["host-manage-bookings"])
+@paginate(CursorPagination, ordering=("start_date", "id"))
+def get_all_bookings(request):
+    bookings = booking_schema_queryset(Booking.objects.filter(product__host_id__in=request.host_ids))
 
     return bookings
 
@@ -243,11 +269,10 @@ def get_all_bookings(request, limiter: Optional[
 # Bookings that have status checked_in can't be changed.
 @router.patch("/bookings/{booking_id}/setpending", response=BookingSchema, tags=["host-manage-bookings"])
 def set_booking_pending(request, booking_id: int):
-    host = Host.objects.get(users=request.user)
-    booking = get_object_or_404(Booking, id=booking_id, product__host=host)
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.host_ids)
 
     try:
-        booking.status = BookingStatus.objects.get(description='pending')
+        booking.status = BookingStatus.objects.get_state(State.PENDING)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -256,11 +281,10 @@ def set_booking_pending(request, booking_id: int):
 
 @router.patch("/bookings/{booking_id}/checkin", response=BookingSchema, tags=["host-manage-bookings"])
 def set_booking_checkin(request, booking_id: int):
-    host = Host.objects.get(users=request.user)
-    booking = get_object_or_404(Booking, id=booking_id, product__host=host)
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.host_ids)
 
     try:
-        booking.status = BookingStatus.objects.get(description='checked_in')
+        booking.status = BookingStatus.objects.get_state(State.CHECKED_IN)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -269,11 +293,10 @@ def set_booking_checkin(request, booking_id: int):
 
 @router.patch("/bookings/{booking_id}/checkout", response=BookingSchema, tags=["host-manage-bookings"])
 def set_booking_checkout(request, booking_id: int):
-    host = Host.objects.get(users=request.user)
-    booking = get_object_or_404(Booking, id=booking_id, product__host=host)
+    booking = get_object_or_404(Booking, id=booking_id, product__host_id__in=request.host_ids)
 
     try:
-        booking.status = BookingStatus.objects.get(description='completed')
+        booking.status = BookingStatus.objects.get_state(State.COMPLETED)
         booking.save()
         return booking
     except BookingStatus.DoesNotExist:
@@ -282,8 +305,9 @@ def set_booking_checkout(request, booking_id: int):
 
 # Mall för List
 @router.get("/hosts", response=List[HostSchema], tags=["Hosts"])
+@paginate(CursorPagination)
 def host_list(request):
-    hosts_list = Host.objects
+    hosts_list = Host.objects.select_related("region")
     return hosts_list
 
 
@@ -293,16 +317,18 @@ def host_list(request):
     response=list[ProductSchema],
     tags=["Host Products", "Products"],
 )
+@paginate(CursorPagination)
 def host_products(request, host_id: int):
     host = get_object_or_404(Host, id=host_id)
-    products_list = Product.objects.filter(host=host)
+    products_list = Product.objects.filter(host=host).select_related("host__region")
     return products_list
 
 
 # List all products
 @router.get("/products", response=List[ProductSchema], tags=["Products"])
+@paginate(CursorPagination)
 def product_list(request):
-    product_list = Product.objects
+    product_list = Product.objects.select_related("host__region")
     return product_list
 
 
@@ -361,8 +387,9 @@ def product_delete(request, product_id: int):
 
 # Get a list of all invoices
 @router.get("/invoices", response=List[InvoiceResponseSchema], tags=["Invoice"])
+@paginate(CursorPagination)
 def list_invoices(request):
-    invoices = Invoice.objects.all()
+    invoices = Invoice.objects.select_related("host__region")
     return invoices
 
 
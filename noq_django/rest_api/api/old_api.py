@@ -23,6 +23,7 @@ from .api_schemas import (
     AvailableSchema,
     InvoiceCreateSchema,
     InvoiceResponseSchema,
+    booking_schema_queryset,
 )
 
 from typing import List
@@ -158,7 +159,7 @@ def product_detail(request, product_id: int):
 @router.get("/bookings/{delta_days}", response=List[BookingSchema], tags=["Bookings"])
 def list_booking(request, delta_days: int):
     selected_date = date.today() + timedelta(days=delta_days)
-    booking_list = Booking.objects.filter(start_date=selected_date)
+    booking_list = booking_schema_queryset(Booking.objects.filter(start_date=selected_date))
     return booking_list
 
 
@@ -0,0 +1,90 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from ninja import Field, Schema
+from ninja.conf import settings
+from ninja.errors import HttpError
+from ninja.pagination import PaginationBase
+
+
+class CursorPagination(PaginationBase):
+    """
+    Keyset pagination for list endpoints, use with ninja's paginate:
+
+        @router.get("/bookings", response=List[BookingSchema])
+        @paginate(CursorPagination, ordering=("start_date", "id"))
+        def get_all_bookings(request):
+            ...
+
+    The ordering must be plain fields of the model, ending with a unique
+    field. The cursor is the ordering values of the last item on the page,
+    so the next page is a range lookup on the ordering instead of an OFFSET
+    that grows with each page.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        page_size: int = Field(settings.PAGINATION_PER_PAGE, ge=1)
+
+    class Output(Schema):
+        items: List[Any]
+        next_cursor: Optional[str] = None
+
+    def __init__(self, ordering=("id",), **kwargs):
+        # The cursor is read with getattr() on the last item
+        if any("__" in field or field.startswith("-") for field in ordering):
+            raise ValueError(f"CursorPagination ordering must be plain ascending fields: {ordering}")
+        self.ordering = ordering
+        super().__init__(**kwargs)
+
+    def paginate_queryset(self, queryset, pagination, **params):
+        page_size = min(pagination.page_size, settings.PAGINATION_MAX_LIMIT)
+        queryset = queryset.order_by(*self.ordering)
+        if pagination.cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(pagination.cursor, queryset.model)))
+
+        # Fetch one extra item to know if there is a next page
+        items = list(queryset[:page_size + 1])
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = self.encode_cursor([getattr(items[-1], field) for field in self.ordering])
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    def after(self, values):
+        # (a, b) > (x, y) written as a > x OR (a = x AND b > y)
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            equal = {ordering_field: value for ordering_field, value in zip(self.ordering[:i], values)}
+            condition |= Q(**equal, **{f"{field}__gt": values[i]})
+        return condition
+
+    def encode_cursor(self, values):
+        data = json.dumps(values, cls=DjangoJSONEncoder).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise HttpError(400, "Invalid cursor.")
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise HttpError(400, "Invalid cursor.")
+
+        # Convert to the field types, so a tampered cursor is rejected here
+        # instead of failing in the query
+        try:
+            values = [model._meta.get_field(field).to_python(value)
+                      for field, value in zip(self.ordering, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise HttpError(400, "Invalid cursor.")
+        if None in values:
+            raise HttpError(400, "Invalid cursor.")
+        return values
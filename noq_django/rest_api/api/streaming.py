@@ -0,0 +1,42 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Rows fetched from the database and written to the response at a time
+STREAM_CHUNK_SIZE = 2000
+
+
+def json_array_chunks(rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Encode rows as a JSON array, chunk_size rows per yielded string, so the
+    whole array is never built in memory.
+    """
+    yield "["
+    separator = ""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, cls=DjangoJSONEncoder))
+        if len(chunk) == chunk_size:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    if chunk:
+        yield separator + ",".join(chunk)
+    yield "]"
+
+
+def stream_json_list(queryset, *fields, chunk_size=STREAM_CHUNK_SIZE, **expressions):
+    """
+    Stream queryset.values(*fields, **expressions) as a JSON array for large
+    exports, use instead of returning a list to ninja:
+
+        @router.get("/guest/export", tags=["Volunteer"])
+        def export_guests(request):
+            return stream_json_list(Client.objects.order_by("id"), "id", "first_name")
+
+    Rows are read with a server-side cursor where the database supports it,
+    so memory stays flat and the first rows are sent before the last are read.
+    """
+    rows = queryset.values(*fields, **expressions).iterator(chunk_size=chunk_size)
+    return StreamingHttpResponse(json_array_chunks(rows, chunk_size), content_type="application/json")
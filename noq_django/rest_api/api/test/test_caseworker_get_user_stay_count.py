@@ -1,6 +1,8 @@
 import sys
 sys.path.append("....backend") # Adds folder where backend is to python modules path.
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.urls import reverse
 from django.contrib.auth.models import User, Group
 from backend.models import Region, Host, Product, Client, Booking, BookingStatus, State, Available
@@ -147,6 +149,21 @@ class TestUserShelterStayCountApi(TestCase):
         self.assertEqual(response_data["user_id"], user_two.id)
         
         self.assertGreaterEqual(len(response_data["user_stay_counts"]), 3)  
+
+
+    def test_client_total_nights_covers_all_pages(self):
+        user_two = User.objects.filter(username=self.user_name_two).first()
+
+        start_date = datetime.now().date().isoformat()
+        end_date = (datetime.now().date() + timedelta(days=3)).isoformat()
+        url = f"/api/caseworker/guests/nights/count/{user_two.id}/{start_date}/{end_date}?per_page=1&page=3"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        response_data = json.loads(response.content)
+        # The last stay is clipped to the period, one of its two nights is counted
+        self.assertEqual([stay["total_nights"] for stay in response_data["user_stay_counts"]], [1])
+        self.assertEqual(response_data["total_nights"], 3)
     
     def test_client_with_one_stay(self):
         
@@ -182,6 +199,31 @@ class TestUserShelterStayCountApi(TestCase):
         self.assertEqual(response_data['user_stay_counts'], [])
 
 
+    def test_shelter_stay_count_pages_over_users(self):
+        user_one = User.objects.get(username=self.user_name_one)
+        user_two = User.objects.get(username=self.user_name_two)
+
+        start_date = datetime.now().date().isoformat()
+        end_date = (datetime.now().date() + timedelta(days=30)).isoformat()
+        url = f"/api/caseworker/guests/nights/count/{start_date}/{end_date}?per_page=1"
+
+        # Group membership and hosts are cached after the first request
+        self.client.get(url + "&page=1")
+        with CaptureQueriesContext(connection) as first_page_queries:
+            response = self.client.get(url + "&page=1")
+        self.assertEqual(response.status_code, 200)
+        response_data = json.loads(response.content)
+        self.assertEqual([user["user_id"] for user in response_data], [user_one.id])
+        self.assertEqual(len(response_data[0]["user_stay_counts"]), 1)
+        self.assertEqual(response_data[0]["user_stay_counts"][0]["host"]["region"]["name"], "Malmö")
+
+        # Only the bookings of the users on the page are fetched
+        with self.assertNumQueries(len(first_page_queries)):
+            response = self.client.get(url + "&page=2")
+        response_data = json.loads(response.content)
+        self.assertEqual([user["user_id"] for user in response_data], [user_two.id])
+        self.assertEqual([stay["total_nights"] for stay in response_data[0]["user_stay_counts"]], [1, 1, 2])
+
     def tearDown(self):
         User.objects.all().delete()
         Client.objects.all().delete()
@@ -8,6 +8,8 @@ from backend.models import (
     Host, Client, Product, Region, Booking, State, BookingStatus, Available
 )
 from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from ..caseworker_api import router
 
 class TestCaseworkerHandleBookingApi(TestCase):
@@ -140,7 +142,7 @@ class TestCaseworkerHandleBookingApi(TestCase):
         # We should get 4 pending bookings via rest api
         response = self.client.get("/api/caseworker/bookings/pending")
         self.assertEqual(response.status_code, 200)
-        parsed_response = json.loads(response.content)
+        parsed_response = json.loads(response.content)["items"]
         self.assertEqual(len(parsed_response), 4)
 
         # Accept 1 booking, there should be 3 pending bookings left
@@ -154,7 +156,7 @@ class TestCaseworkerHandleBookingApi(TestCase):
         # We should get 3 pending bookings via rest api
         response = self.client.get("/api/caseworker/bookings/pending")
         self.assertEqual(response.status_code, 200)
-        parsed_response = json.loads(response.content)
+        parsed_response = json.loads(response.content)["items"]
         self.assertEqual(len(parsed_response), 3)
 
         # Decline 1 booking, there should be 2 pending bookings left
@@ -171,10 +173,46 @@ class TestCaseworkerHandleBookingApi(TestCase):
         # We should get 2 pending bookings via rest api
         response = self.client.get("/api/caseworker/bookings/pending")
         self.assertEqual(response.status_code, 200)
-        parsed_response = json.loads(response.content)
+        parsed_response = json.loads(response.content)["items"]
         self.assertEqual(len(parsed_response), 2)
 
 
+    def test_pending_bookings_over_hosts_in_constant_queries(self):
+        caseworker_user = User.objects.get(username="user.caseworker@test.nu")
+        host = Host.objects.get(name="Host 1")
+        host.caseworkers.add(caseworker_user)
+
+        # Group membership and hosts are cached after the first request
+        self.client.get("/api/caseworker/bookings/pending")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/caseworker/bookings/pending")
+        self.assertEqual(len(json.loads(response.content)["items"]), 4)
+        query_count = len(queries)
+
+        # More hosts with pending bookings don't add queries
+        region = Region.objects.get(name="Malmö")
+        for i in range(3):
+            other_host = Host.objects.create(name="Other " + str(i), region=region)
+            other_host.caseworkers.add(caseworker_user)
+            product = Product.objects.create(name="room", total_places=5, host=other_host, type="room")
+            Booking.objects.create(start_date=datetime.now().date() + timedelta(days=i + 2),
+                                   end_date=datetime.now().date() + timedelta(days=i + 3),
+                                   product=product, user=Client.objects.first(), status_id=State.PENDING)
+        Host.objects.create(name="Not mine", region=region)
+
+        self.client.get("/api/caseworker/bookings/pending")
+        with self.assertNumQueries(query_count):
+            response = self.client.get("/api/caseworker/bookings/pending?page_size=5")
+        parsed_response = json.loads(response.content)
+        self.assertEqual(len(parsed_response["items"]), 5)
+        self.assertEqual(parsed_response["items"][-1]["product"]["host"]["name"], "Other 0")
+
+        response = self.client.get("/api/caseworker/bookings/pending?page_size=5&cursor=" + parsed_response["next_cursor"])
+        parsed_response = json.loads(response.content)
+        self.assertEqual([b["product"]["host"]["name"] for b in parsed_response["items"]], ["Other 1", "Other 2"])
+        self.assertIsNone(parsed_response["next_cursor"])
+
+
     def test_batch_accept_bookings(self):
         # Connect host_user and host
         host = Host.objects.get(name="Host 1")
@@ -205,7 +243,7 @@ class TestCaseworkerHandleBookingApi(TestCase):
         # We should get 0 pending bookings via rest api
         response = self.client.get("/api/caseworker/bookings/pending")
         self.assertEqual(response.status_code, 200)
-        parsed_response = json.loads(response.content)
+        parsed_response = json.loads(response.content)["items"]
         self.assertEqual(len(parsed_response), 0)
 
 
@@ -224,10 +262,10 @@ class TestCaseworkerHandleBookingApi(TestCase):
         for product in products:
             current_bookings = Booking.objects.filter(product=product).count()
             places_left = product.total_places - current_bookings
-            Available.objects.create(
-                product=product, 
-                places_left=places_left,
-                available_date=current_date
+            Available.objects.update_or_create(
+                product=product,
+                available_date=current_date,
+                defaults={"places_left": places_left}
             )
 
         # Test the new API that returns available places for all products
@@ -251,6 +289,42 @@ class TestCaseworkerHandleBookingApi(TestCase):
             self.assertEqual(data[i]['description'], product.description)
 
 
+    def test_get_available_places_all_uses_today(self):
+        caseworker_user = User.objects.get(username="user.caseworker@test.nu")
+        host = Host.objects.get(name="Host 1")
+        host.caseworkers.add(caseworker_user)
+        region = Region.objects.get(name="Malmö")
+        for i in range(3):
+            other_host = Host.objects.create(name="Other " + str(i), region=region)
+            other_host.caseworkers.add(caseworker_user)
+            Product.objects.create(name="room " + str(i), total_places=3, host=other_host, type="room")
+
+        # Only today's availability counts, not other dates
+        product = Product.objects.get(name="room")
+        today = datetime.now().date()
+        Available.objects.filter(product=product).delete()
+        Available.objects.create(product=product, available_date=today - timedelta(days=1), places_left=0)
+        Available.objects.create(product=product, available_date=today, places_left=2)
+        Available.objects.create(product=product, available_date=today + timedelta(days=1), places_left=4)
+
+        # Group membership and hosts are cached after the first request
+        self.client.get("/api/caseworker/available_all")
+        # Session, user and products
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/caseworker/available_all")
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [(p["name"], p["places_left"]) for p in data],
+            [("room", 2), ("room 0", 3), ("room 1", 3), ("room 2", 3)],
+        )
+        self.assertEqual(data[1]["host"]["region"]["name"], "Malmö")
+
+    def test_get_available_places_all_without_hosts(self):
+        response = self.client.get("/api/caseworker/available_all")
+        self.assertEqual(response.status_code, 404)
+
+
     def tearDown(self):
         # After the tests delete all data generated for the tests
         self.delete_products()
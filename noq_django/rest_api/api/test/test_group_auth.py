@@ -0,0 +1,140 @@
+from django.contrib.auth.models import User, Group
+from django.core.cache import cache
+from django.test import TestCase
+from backend.auth import user_cache_key, user_caseworker_host_ids, user_group_names, user_host_ids
+from backend.models import Host, Region
+
+
+class TestGroupAuth(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.username = "host@test.com"
+        self.password = "securepass123"
+        self.user = User.objects.create_user(username=self.username, password=self.password)
+        self.host_group, _ = Group.objects.get_or_create(name="host")
+        self.volunteer_group, _ = Group.objects.get_or_create(name="volunteer")
+        self.user.groups.add(self.host_group)
+
+    def group_names(self):
+        # A new user object, as in a new request
+        return user_group_names(User.objects.get(id=self.user.id))
+
+    def test_group_names_are_cached(self):
+        self.assertEqual(self.group_names(), ["host"])
+
+        user = User.objects.get(id=self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_group_names(user), ["host"])
+            self.assertEqual(user_group_names(user), ["host"])
+
+    def test_cache_is_cleared_when_groups_change(self):
+        self.assertEqual(self.group_names(), ["host"])
+
+        self.user.groups.add(self.volunteer_group)
+        self.assertEqual(self.group_names(), ["host", "volunteer"])
+
+        self.user.groups.remove(self.host_group)
+        self.assertEqual(self.group_names(), ["volunteer"])
+
+        self.host_group.user_set.add(self.user)
+        self.assertEqual(self.group_names(), ["host", "volunteer"])
+
+        self.volunteer_group.user_set.clear()
+        self.assertEqual(self.group_names(), ["host"])
+
+        self.host_group.name = "värd"
+        self.host_group.save()
+        self.assertEqual(self.group_names(), ["värd"])
+
+        self.host_group.delete()
+        self.assertEqual(self.group_names(), [])
+
+        self.user.groups.add(self.volunteer_group)
+        self.user.groups.clear()
+        self.assertEqual(self.group_names(), [])
+
+    def test_new_user_does_not_get_cached_groups(self):
+        cache.set(user_cache_key("user_groups", self.user.id + 1), ["host"])
+        user = User.objects.create_user(username="new@test.com", password=self.password)
+        self.assertEqual(user.id, self.user.id + 1)
+        self.assertEqual(user_group_names(user), [])
+
+    def test_router_auth_uses_cached_groups(self):
+        self.client.login(username=self.username, password=self.password)
+        self.assertEqual(self.client.get("/api/volunteer/compass/").status_code, 401)
+
+        self.user.groups.add(self.volunteer_group)
+        self.assertEqual(self.client.get("/api/volunteer/compass/").status_code, 200)
+
+        with self.assertNumQueries(3):
+            # Session, user and resources, no group lookup
+            response = self.client.get("/api/volunteer/compass/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_multi_process_settings_use_a_shared_cache(self):
+        # Signals only clear a LocMemCache in the process that made the change
+        from rest_api.settings import dev_docker, prod
+        for settings in [prod, dev_docker]:
+            self.assertNotIn("locmem", settings.CACHES["default"]["BACKEND"])
+
+    def test_self_auth_returns_groups(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get("/api/self/auth/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["groups"], ["host"])
+
+
+class TestHostAuth(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.password = "securepass123"
+        self.user = User.objects.create_user(username="host@test.com", password=self.password)
+        self.user.groups.add(Group.objects.get_or_create(name="host")[0])
+        self.region = Region.objects.create(name="Malmö")
+        self.host = Host.objects.create(name="Härbärget", region=self.region)
+        self.other_host = Host.objects.create(name="Nattis", region=self.region)
+        self.host.users.add(self.user)
+
+    def host_ids(self):
+        return user_host_ids(User.objects.get(id=self.user.id))
+
+    def caseworker_host_ids(self):
+        return user_caseworker_host_ids(User.objects.get(id=self.user.id))
+
+    def test_host_ids_are_cached(self):
+        self.assertEqual(self.host_ids(), [self.host.id])
+        user = User.objects.get(id=self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_host_ids(user), [self.host.id])
+
+    def test_cache_is_cleared_when_hosts_change(self):
+        self.assertEqual(self.host_ids(), [self.host.id])
+        self.assertEqual(self.caseworker_host_ids(), [])
+
+        self.other_host.users.add(self.user)
+        self.assertEqual(self.host_ids(), [self.host.id, self.other_host.id])
+
+        self.user.host_set.remove(self.host)
+        self.assertEqual(self.host_ids(), [self.other_host.id])
+
+        self.other_host.users.clear()
+        self.assertEqual(self.host_ids(), [])
+
+        self.user.caseworker_hosts.add(self.host)
+        self.assertEqual(self.caseworker_host_ids(), [self.host.id])
+
+        self.host.delete()
+        self.assertEqual(self.caseworker_host_ids(), [])
+
+    def test_host_router_sets_host_ids(self):
+        self.client.login(username="host@test.com", password=self.password)
+        self.assertEqual(self.client.get("/api/host/").json()["id"], self.host.id)
+
+        with self.assertNumQueries(3):
+            # Session, user and host, no group or host lookup
+            response = self.client.get("/api/host/")
+        self.assertEqual(response.json()["id"], self.host.id)
+
+        self.host.users.remove(self.user)
+        self.other_host.users.add(self.user)
+        self.assertEqual(self.client.get("/api/host/").json()["id"], self.other_host.id)
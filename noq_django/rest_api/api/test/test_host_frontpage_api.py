@@ -169,6 +169,106 @@ class TestHostFrontpageApi(TestCase):
         self.assertEqual(data['available_dates'][str(tomorrows_date)][1]['places_left'], 1)
 
 
+
+    def test_count_bookings_host(self):
+        # Connect host_user and host
+        host = Host.objects.get(name="Host 2")
+        host_user = User.objects.get(username=self.host_name)
+        host.users.add(host_user)
+
+        products = Product.objects.filter(host_id=host).order_by("id")
+        clients = Client.objects.all()
+        current_date = datetime.now().date()
+
+        # Arriving today, pending and checked in guests leaving today
+        Booking.objects.create(start_date=current_date, end_date=current_date + timedelta(days=2),
+                               product=products[0], user=clients[0], status_id=State.PENDING)
+        Booking.objects.create(start_date=current_date + timedelta(days=3), end_date=current_date + timedelta(days=4),
+                               product=products[0], user=clients[1], status_id=State.ACCEPTED)
+        leaving = Booking.objects.create(start_date=current_date, end_date=current_date + timedelta(days=1),
+                                         product=products[1], user=clients[2], status_id=State.CHECKED_IN)
+        Booking.objects.filter(id=leaving.id).update(start_date=current_date - timedelta(days=1),
+                                                     end_date=current_date)
+        Booking.objects.create(start_date=current_date, end_date=current_date + timedelta(days=1),
+                               product=products[1], user=clients[3], status_id=State.CHECKED_IN)
+        # Fill up the second product for today
+        Available.objects.filter(product=products[1], available_date=current_date).update(places_left=0)
+
+        # The number of queries doesn't depend on the number of products
+        for i in range(5):
+            Product.objects.create(name="room " + str(i), total_places=1, host=host, type="woman-only")
+
+        # Session, user, groups, host, counters and available products
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/host/count_bookings")
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["pending_count"], 2)
+        self.assertEqual(data["arrivals_count"], 1)
+        self.assertEqual(data["departures_count"], 1)
+        self.assertEqual(data["current_guests_count"], 2)
+        self.assertEqual(data["available_products"], {"room": 1, "woman-only": 5})
+
+
+    def test_get_calendar_host(self):
+        # Connect host_user and host
+        host = Host.objects.get(name="Host 2")
+        host_user = User.objects.get(username=self.host_name)
+        host.users.add(host_user)
+
+        products = Product.objects.filter(host_id=host).order_by("id")
+        clients = Client.objects.all()
+        current_date = datetime.now().date()
+        Booking.objects.create(start_date=current_date + timedelta(days=1), end_date=current_date + timedelta(days=3),
+                               product=products[1], user=clients[0], status_id=State.PENDING)
+
+        # Session, user, groups, host, products and available
+        with self.assertNumQueries(6):
+            response = self.client.get("/api/host/calendar?nr_of_days=4")
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data["start_date"], str(current_date))
+        self.assertEqual([product["id"] for product in data["products"]], [product.id for product in products])
+        self.assertEqual(data["products"][0]["places_left"], [5, 5, 5, 5])
+        self.assertEqual(data["products"][1]["places_left"], [3, 2, 2, 3])
+
+        # Long windows are streamed with the same content
+        response = self.client.get("/api/host/calendar?nr_of_days=100")
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["nr_of_days"], 100)
+        self.assertEqual(data["products"][1]["places_left"][:4], [3, 2, 2, 3])
+        self.assertEqual(len(data["products"][1]["places_left"]), 100)
+
+        response = self.client.get("/api/host/calendar?nr_of_days=1000")
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_get_occupancy_host(self):
+        # Connect host_user and host
+        host = Host.objects.get(name="Host 2")
+        host.users.add(User.objects.get(username=self.host_name))
+
+        products = Product.objects.filter(host_id=host).order_by("id")
+        clients = Client.objects.all()
+        current_date = datetime.now().date()
+        for i, product in enumerate(products):
+            Booking.objects.create(start_date=current_date, end_date=current_date + timedelta(days=2),
+                                   product=product, user=clients[i], status_id=State.CHECKED_IN)
+
+        response = self.client.get(
+            f"/api/host/occupancy?start_date={current_date}&end_date={current_date + timedelta(days=3)}")
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual([row["date"] for row in data],
+                         [str(current_date + timedelta(days=i)) for i in range(3)])
+        self.assertEqual([row["occupied"] for row in data], [2, 2, 0])
+        self.assertEqual([row["arrivals"] for row in data], [2, 0, 0])
+        self.assertEqual([row["departures"] for row in data], [0, 0, 2])
+
     def tearDown(self):
         # After the tests delete all data generated for the tests
         self.delete_products()
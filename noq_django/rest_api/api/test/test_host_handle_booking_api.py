@@ -1,14 +1,18 @@
 import sys
 sys.path.append("....backend") # Adds folder where backend is to python modules path.
+import base64
 import json
 from datetime import datetime, timedelta
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth.models import User, Group
 from backend.models import (
     Host, Client, Product, Region, Booking, State, BookingStatus, Available
 )
 from django.test import Client as TestClient
 from ..host_api import router
+from ..pagination import CursorPagination
 
 class TestHostHandleBookingApi(TestCase):
     host_user = None
@@ -156,9 +160,19 @@ class TestHostHandleBookingApi(TestCase):
         # We should get 0 pending bookings via rest api
         response = self.client.get("/api/host/pending")
         self.assertEqual(response.status_code, 200)
-        parsed_response = json.loads(response.content)
+        parsed_response = json.loads(response.content)["items"]
         self.assertEqual(len(parsed_response), 0)
 
+    def test_batch_accept_unknown_booking_changes_nothing(self):
+        url = "/api/host/pending/batch/accept"
+        booking_ids = list(Booking.objects.values_list("id", flat=True))
+        payload = [{'booking_id': booking_id} for booking_id in booking_ids + [max(booking_ids) + 1]]
+
+        response = self.client.patch(url, json.dumps(payload), format='json')
+        self.assertEqual(response.status_code, 404)
+        pending_count = Booking.objects.filter(status=State.PENDING).count()
+        self.assertEqual(pending_count, 4)
+
     def test_pending_bookings_exclude_past_start_date(self):
 
         # Create one booking with a past start date
@@ -187,9 +201,77 @@ class TestHostHandleBookingApi(TestCase):
         self.assertEqual(response.status_code, 200)
 
         # Parse response and verify that only the future booking is included
-        bookings = json.loads(response.content)
+        bookings = json.loads(response.content)["items"]
         self.assertEqual(len(bookings), 5)  # Only 5 bookings should be returned (The 4 bookings created in the set up function plus the one booking that has a future start date)
-        
+
+
+    def test_pending_bookings_cursor_pagination(self):
+        # Add bookings later on, so the pages are ordered on start date and id
+        product = Product.objects.get(name="room")
+        for guest in Client.objects.all()[:3]:
+            Booking.objects.create(start_date=datetime.now().date() + timedelta(days=3),
+                                   end_date=datetime.now().date() + timedelta(days=4),
+                                   product=product, user=guest, status_id=State.PENDING)
+        expected_ids = list(Booking.objects.order_by("start_date", "id").values_list("id", flat=True))
+
+        booking_ids = []
+        url = "/api/host/pending?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.content)
+            self.assertLessEqual(len(page["items"]), 3)
+            booking_ids += [booking["id"] for booking in page["items"]]
+            url = f"/api/host/pending?page_size=3&cursor={page['next_cursor']}" if page["next_cursor"] else None
+
+        self.assertEqual(booking_ids, expected_ids)
+
+        response = self.client.get("/api/host/pending?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+    def test_pending_bookings_type_invalid_cursor(self):
+        # Well-formed cursors with values that don't fit the ordering fields
+        for values in [["abc", 1], ["2024-01-01", "x"], [None, 1], [{}, 1]]:
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(f"/api/host/pending?cursor={cursor}")
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(json.loads(response.content)["detail"], "Invalid cursor.")
+
+    def test_cursor_ordering_must_be_plain_fields(self):
+        with self.assertRaises(ValueError):
+            CursorPagination(ordering=("product__host__name", "id"))
+
+    def test_booking_lists_query_count_is_constant(self):
+        urls = ["/api/host/pending", "/api/host/bookings/incoming"]
+        # Group membership and hosts are cached after the first request
+        self.client.get(urls[0])
+        query_counts = {}
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(json.loads(response.content)["items"]), 4)
+            query_counts[url] = len(queries)
+
+        # Add bookings for new clients in another region
+        region = Region.objects.create(name="Lund")
+        product = Product.objects.get(name="room")
+        product.total_places = 20
+        product.save()
+        for i in range(10):
+            user = User.objects.create_user(username="extra.user" + str(i), password=self.password)
+            client = Client.objects.create(first_name="Jane" + str(i), last_name="Doe", gender="K",
+                                           region=region, last_edit=datetime.now().date(), user=user)
+            Booking.objects.create(start_date=datetime.now().date(), end_date=datetime.now().date() + timedelta(days=1),
+                                   product=product, user=client, status_id=State.PENDING)
+
+        for url in urls:
+            with self.assertNumQueries(query_counts[url]):
+                response = self.client.get(url)
+            bookings = json.loads(response.content)["items"]
+            self.assertEqual(len(bookings), 14)
+            self.assertEqual(bookings[-1]["status"]["description"], "pending")
+            self.assertEqual(bookings[-1]["product"]["host"]["region"]["name"], "Malmö")
+            self.assertEqual(bookings[-1]["user"]["region"]["name"], "Lund")
 
     def tearDown(self):
         # After the tests delete all data generated for the tests
@@ -22,7 +22,7 @@ class TestProductsApi(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
-        data = json.loads(response.content)
+        data = json.loads(response.content)["items"]
         count = len(data)
         self.assertEqual(count, products_count)
 
@@ -35,7 +35,7 @@ class TestProductsApi(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
-        data = json.loads(response.content)
+        data = json.loads(response.content)["items"]
         count = len(data)
         self.assertEqual(count, products_count)
 
@@ -146,10 +146,10 @@ class TestProductsApi(TestCase):
         )
         
         # Create availability for the product
-        availability = Available.objects.create(
+        availability, created = Available.objects.update_or_create(
             product=product,
             available_date=datetime.now().date(),
-            places_left=product.total_places -1,  # Assuming 1 place is booked
+            defaults={"places_left": product.total_places -1},  # Assuming 1 place is booked
         )
 
         # Ensure the product has bookings and availability
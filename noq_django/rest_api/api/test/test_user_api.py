@@ -227,6 +227,59 @@ class TestProductsApi(TestCase):
         self.assertEqual(data[1]["products"][1]["places_left"], 8)
 
 
+    def test_get_available_products_query_count(self):
+        # Places left come from the same query as the products, so a full
+        # product is left out and the others don't need extra queries
+        current_date = datetime.now().date()
+        full_product = Product.objects.get(total_places=4)
+        Available.objects.update_or_create(
+            product=full_product, available_date=current_date, defaults={"places_left": 0})
+        Available.objects.update_or_create(
+            product=Product.objects.get(total_places=8), available_date=current_date,
+            defaults={"places_left": 3})
+
+        url = "/api/user/available/" + str(current_date)
+        # Session, user, groups and products
+        with self.assertNumQueries(4):
+            response = self.t_data.test_client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        places_left = [product["places_left"] for host in data for product in host["products"]]
+        self.assertEqual(places_left, [2, 1, 6, 3])
+
+
+    def test_get_available_products_for_range(self):
+        # A product is only listed if it has places left every night
+        current_date = datetime.now().date()
+        Available.objects.update_or_create(
+            product=Product.objects.get(total_places=4),
+            available_date=current_date + timedelta(days=2), defaults={"places_left": 0})
+        Available.objects.update_or_create(
+            product=Product.objects.get(total_places=8),
+            available_date=current_date + timedelta(days=1), defaults={"places_left": 3})
+
+        url = f"/api/user/available/{current_date}/{current_date + timedelta(days=3)}"
+        # Session, user, groups and products
+        with self.assertNumQueries(4):
+            response = self.t_data.test_client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        places_left = [product["places_left"] for host in data for product in host["products"]]
+        self.assertEqual(places_left, [2, 1, 6, 3])
+
+        # The full night is outside of the range
+        url = f"/api/user/available/{current_date}/{current_date + timedelta(days=2)}"
+        response = self.t_data.test_client.get(url)
+        data = json.loads(response.content)
+        places_left = [product["places_left"] for host in data for product in host["products"]]
+        self.assertEqual(places_left, [2, 4, 1, 6, 3])
+
+        url = f"/api/user/available/{current_date}/{current_date}"
+        response = self.t_data.test_client.get(url)
+        self.assertEqual(response.status_code, 400)
+
     def test_book_a_product_success(self):
         '''
         Create a booking
@@ -2,7 +2,10 @@ from django.test import TestCase
 from django.contrib.auth.models import User, Group
 from django.test import Client as TestClient
 from backend.models import Resource
-from datetime import time
+from datetime import datetime, time
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import json
 import base64
 
@@ -40,7 +43,7 @@ class TestVolunteerCompassAPI(TestCase):
         # response = self.client.get("/api/volunteer/compass/")
         response = self.client.get("/api/volunteer/compass/", **self.auth_headers())
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(response.json()["items"]), 1)
 
     def test_get_resource_by_id(self):
         response = self.client.get(f"/api/volunteer/compass/resources/{self.resource.id}", **self.auth_headers())
@@ -66,7 +69,7 @@ class TestVolunteerCompassAPI(TestCase):
         )
         response = self.client.get("/api/volunteer/compass/?target_group=Under 18", **self.auth_headers())
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(any("Youth Center" in r["name"] for r in response.json()))
+        self.assertTrue(any("Youth Center" in r["name"] for r in response.json()["items"]))
 
     def test_filter_by_applies_to(self):
         Resource.objects.create(
@@ -82,7 +85,7 @@ class TestVolunteerCompassAPI(TestCase):
         )
         response = self.client.get("/api/volunteer/compass/?applies_to=Psykisk ohälsa", **self.auth_headers())
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(any("Crisis Support" in r["name"] for r in response.json()))
+        self.assertTrue(any("Crisis Support" in r["name"] for r in response.json()["items"]))
 
     def test_search_by_keyword(self):
         Resource.objects.create(
@@ -98,7 +101,7 @@ class TestVolunteerCompassAPI(TestCase):
         )
         response = self.client.get("/api/volunteer/compass/?search=goteborg", **self.auth_headers())
         self.assertEqual(response.status_code, 200)
-        self.assertTrue(any("Göteborg Center" in r["name"] for r in response.json()))
+        self.assertTrue(any("Göteborg Center" in r["name"] for r in response.json()["items"]))
 
     def test_sort_by_name_az(self):
         Resource.objects.create(
@@ -124,7 +127,7 @@ class TestVolunteerCompassAPI(TestCase):
             applies_to=["Sysselsättning"]
         )
         response = self.client.get("/api/volunteer/compass/?sort=name", **self.auth_headers())
-        names = [r["name"] for r in response.json() if r["name"] in ["Alpha Resource", "Beta Resource"]]
+        names = [r["name"] for r in response.json()["items"] if r["name"] in ["Alpha Resource", "Beta Resource"]]
         self.assertEqual(names, sorted(names))
 
 
@@ -135,6 +138,68 @@ class TestVolunteerCompassAPI(TestCase):
         response = self.client.get("/api/volunteer/compass/", **self.auth_headers())
         self.assertEqual(response.status_code, 200)
 
-        data = response.json()
+        data = response.json()["items"]
         self.assertTrue("type" in data[0])
-        self.assertEqual(data[0]["type"], "direktinsats")
\ No newline at end of file
+        self.assertEqual(data[0]["type"], "direktinsats")
+
+    def test_filters_are_applied_in_the_database(self):
+        Resource.objects.create(
+            name="Nattcafé Östra",
+            opening_time=time(20, 0),
+            closing_time=time(23, 0),
+            target_group="Under 18",
+            applies_to="Hemlöshet, Våld",
+        )
+
+        def names(query):
+            response = self.client.get(f"/api/volunteer/compass/?{query}", **self.auth_headers())
+            self.assertEqual(response.status_code, 200)
+            return sorted(r["name"] for r in response.json()["items"])
+
+        self.assertEqual(names("search=NATTCAFE ostra"), ["Nattcafé Östra"])
+        self.assertEqual(names("search=123 main"), ["Test Center"])
+        self.assertEqual(names("target_group=Under 18"), ["Nattcafé Östra"])
+        self.assertEqual(names("applies_to=Våld"), ["Nattcafé Östra"])
+        self.assertEqual(names("applies_to=Våld&applies_to=Missbruk"), ["Nattcafé Östra", "Test Center"])
+        self.assertEqual(names("applies_to=Psykisk&applies_to=ohälsa"), [])
+        self.assertEqual(names("search=test&applies_to=Våld"), [])
+
+    def test_search_text_is_updated_on_save(self):
+        self.assertIn("psykisk ohalsa", self.resource.search_text)
+        self.resource.name = "Hjälpcentralen"
+        self.resource.save()
+        self.assertTrue(Resource.objects.search("hjalpcentral").exists())
+        self.assertFalse(Resource.objects.search("test center").exists())
+
+    def test_open_now_handles_overnight_hours(self):
+        night = Resource.objects.create(
+            name="Natthärbärge",
+            opening_time=time(22, 0),
+            closing_time=time(6, 0),
+        )
+
+        def open_names(at):
+            return sorted(r.name for r in Resource.objects.open_at(at))
+
+        self.assertEqual(open_names(time(12, 0)), ["Test Center"])
+        self.assertEqual(open_names(time(23, 30)), ["Natthärbärge"])
+        self.assertEqual(open_names(time(3, 0)), ["Natthärbärge"])
+        self.assertEqual(open_names(time(6, 0)), ["Natthärbärge"])
+        self.assertEqual(open_names(time(7, 0)), [])
+
+        with patch("django.utils.timezone.localtime", return_value=datetime(2024, 1, 1, 1, 30)):
+            self.assertTrue(night.is_open_now())
+            self.assertFalse(self.resource.is_open_now())
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/api/volunteer/compass/?open_now=true", **self.auth_headers())
+            self.assertEqual(response.status_code, 200)
+            items = response.json()["items"]
+            self.assertEqual([(r["name"], r["is_open_now"]) for r in items], [("Natthärbärge", True)])
+            self.assertEqual(len([q for q in queries if "backend_resource" in q["sql"]]), 1)
+
+            response = self.client.get("/api/volunteer/compass/", **self.auth_headers())
+            self.assertEqual(
+                {r["name"]: r["is_open_now"] for r in response.json()["items"]},
+                {"Test Center": False, "Natthärbärge": True},
+            )
@@ -0,0 +1,179 @@
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from django.test import Client as TestClient
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from backend.models import Client, Region
+from backend.search import client_trigram_index, similarity, trigrams
+from rest_api.api.streaming import json_array_chunks
+import base64
+import json
+
+
+class GuestSearchTestCase(TestCase):
+    def auth_headers(self):
+        credentials = f"{self.username}:{self.password}"
+        encoded = base64.b64encode(credentials.encode()).decode()
+        return {"HTTP_AUTHORIZATION": f"Basic {encoded}"}
+
+    def setUp(self):
+        self.username = "volunteer@test.com"
+        self.password = "securepass123"
+        self.user = User.objects.create_user(username=self.username, password=self.password)
+
+        volunteer_group, _ = Group.objects.get_or_create(name="volunteer")
+        self.user.groups.add(volunteer_group)
+
+        self.client = TestClient()
+        self.client.login(username=self.username, password=self.password)
+
+        self.region = Region.objects.create(name="Stockholm")
+        self.create_guest("Åsa", "Öberg", "ABC123")
+        self.create_guest("Asad", "Berg", "XYZ999")
+        self.create_guest("Per", "Nilsson", "ABD456")
+
+    def create_guest(self, first_name, last_name, unokod):
+        guest = User.objects.create_user(
+            username=f"guest{User.objects.count()}@test.com", password="guestpass123")
+        return Client.objects.create(
+            user=guest, first_name=first_name, last_name=last_name,
+            unokod=unokod, gender="K", region=self.region,
+        )
+
+
+class TestVolunteerGuestSearchAPI(GuestSearchTestCase):
+    def search(self, **params):
+        response = self.client.get("/api/volunteer/guest/search", params, **self.auth_headers())
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_search_fields_are_normalized(self):
+        client = Client.objects.get(first_name="Åsa")
+        self.assertEqual(client.search_first_name, "asa")
+        self.assertEqual(client.search_last_name, "oberg")
+        self.assertEqual(client.search_unokod, "abc123")
+
+    def test_search_fields_keep_non_latin_letters(self):
+        client = self.create_guest("Мария", "Straße", "ÖRJ1")
+        self.assertEqual(client.search_first_name, "мария")
+        self.assertEqual(client.search_last_name, "strasse")
+        self.assertEqual(client.search_unokod, "orj1")
+        self.assertEqual(self.create_guest("Łukasz", "Øberg", "").search_first_name, "łukasz")
+
+    def test_search_non_latin_names(self):
+        self.create_guest("Мария", "Иванова", "RUS1")
+        self.create_guest("Łukasz", "Nowak", "POL1")
+
+        guests = self.search(first_name="МАР")
+        self.assertEqual([c["first_name"] for c in guests], ["Мария"])
+        self.assertEqual([c["last_name"] for c in self.search(last_name="иванова")], ["Иванова"])
+        self.assertEqual([c["first_name"] for c in self.search(first_name="Łuk")], ["Łukasz"])
+
+    def test_search_is_prefix_and_accent_insensitive(self):
+        names = sorted(c["first_name"] for c in self.search(first_name=" as "))
+        self.assertEqual(names, ["Asad", "Åsa"])
+
+        guests = self.search(last_name="OBER")
+        self.assertEqual([c["last_name"] for c in guests], ["Öberg"])
+        self.assertEqual(guests[0]["region_name"], "Stockholm")
+
+        self.assertEqual(len(self.search(uno="ab")), 2)
+        self.assertEqual(self.search(first_name="x"), [])
+
+    def test_search_matches_any_field(self):
+        names = sorted(c["first_name"] for c in self.search(first_name="per", uno="xyz"))
+        self.assertEqual(names, ["Asad", "Per"])
+
+    def test_search_query_count(self):
+        # One query for the guests and their regions, apart from authentication
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/api/volunteer/guest/search", {"first_name": "a"}, **self.auth_headers())
+        self.assertEqual(len(response.json()), 2)
+        client_queries = [q["sql"] for q in queries if '"client"' in q["sql"]]
+        self.assertEqual(len(client_queries), 1)
+
+    def test_search_requires_a_parameter(self):
+        response = self.client.get("/api/volunteer/guest/search", **self.auth_headers())
+        self.assertEqual(response.status_code, 400)
+
+
+class TestVolunteerFuzzyGuestSearchAPI(GuestSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        # The in-memory index outlives the test transactions
+        client_trigram_index.clear()
+
+    def fuzzy_search(self, **params):
+        response = self.client.get("/api/volunteer/guest/search/fuzzy", params, **self.auth_headers())
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_trigrams_match_pg_trgm(self):
+        self.assertEqual(trigrams("Ola"), {"  o", " ol", "ola", "la "})
+        self.assertEqual(similarity("nilsson", "nilsson"), 1.0)
+        self.assertEqual(similarity("nilsson", "xyz"), 0.0)
+
+    def test_fuzzy_search_ranks_misspelled_names(self):
+        guests = self.fuzzy_search(last_name="Nilson")
+        self.assertEqual([c["last_name"] for c in guests], ["Nilsson"])
+        self.assertGreater(guests[0]["similarity"], 0.5)
+
+        guests = self.fuzzy_search(first_name="Asa", last_name="Oberg")
+        self.assertEqual(guests[0]["first_name"], "Åsa")
+        self.assertEqual(guests[0]["region_name"], "Stockholm")
+        self.assertEqual([c["first_name"] for c in guests], ["Åsa", "Asad"])
+
+        self.assertEqual(self.fuzzy_search(uno="ABC124")[0]["unokod"], "ABC123")
+        self.assertEqual(self.fuzzy_search(first_name="qqq"), [])
+
+    def test_fuzzy_search_non_latin_names(self):
+        self.create_guest("Мария", "Иванова", "RUS1")
+        self.create_guest("Łukasz", "Øberg", "POL1")
+
+        guests = self.fuzzy_search(first_name="Марья")
+        self.assertEqual([c["first_name"] for c in guests], ["Мария"])
+
+        # Ł and Ø are letters of their own, not accents, but still near matches
+        guests = self.fuzzy_search(first_name="Lukasz")
+        self.assertEqual([c["first_name"] for c in guests], ["Łukasz"])
+        self.assertLess(guests[0]["similarity"], 1.0)
+        self.assertEqual(self.fuzzy_search(first_name="Łukasz")[0]["similarity"], 1.0)
+        self.assertIn("Øberg", [c["last_name"] for c in self.fuzzy_search(last_name="Oberg")])
+
+    def test_fuzzy_search_limit(self):
+        self.assertEqual(len(self.fuzzy_search(first_name="asa", last_name="berg", limit=1)), 1)
+
+    def test_fuzzy_search_index_follows_changes(self):
+        self.assertEqual(len(self.fuzzy_search(last_name="Nilsson")), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client = Client.objects.get(last_name="Nilsson")
+            client.last_name = "Ekholm"
+            client.save()
+        self.assertEqual(self.fuzzy_search(last_name="Nilsson"), [])
+        self.assertEqual(self.fuzzy_search(last_name="Ekholn")[0]["id"], client.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.delete()
+        self.assertEqual(self.fuzzy_search(last_name="Ekholm"), [])
+
+
+class TestVolunteerGuestExportAPI(GuestSearchTestCase):
+    def test_export_guests_is_streamed(self):
+        response = self.client.get("/api/volunteer/guest/export", **self.auth_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        guests = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([c["first_name"] for c in guests], ["Åsa", "Asad", "Per"])
+        self.assertEqual(
+            set(guests[0]), {"id", "first_name", "last_name", "unokod", "region_name"})
+        self.assertEqual(guests[0]["region_name"], "Stockholm")
+
+    def test_json_array_chunks(self):
+        rows = [{"id": i} for i in range(5)]
+        chunks = list(json_array_chunks(iter(rows), chunk_size=2))
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(json.loads("".join(chunks)), rows)
+        self.assertEqual(json.loads("".join(json_array_chunks(iter([])))), [])
@@ -1,6 +1,7 @@
 from ninja import Router
 from ninja.errors import HttpError
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from backend.models import (
     Client,
@@ -8,6 +9,7 @@ from backend.models import (
     Product,
     Booking,
     BookingStatus,
+    State,
     Available,
 )
 
@@ -19,6 +21,7 @@ from .api_schemas import (
     AvailableHostProductsSchema,
     ProductSchemaWithDates,
     AvailableDateSchema,
+    booking_schema_queryset,
 )
 
 from backend.auth import group_auth
@@ -31,6 +34,15 @@ from datetime import date
 
 router = Router(auth=lambda request: group_auth(request, "user")) #request defineras vid call, gruppnamnet är statiskt
 
+def group_available_products(products):
+    # Products with places left, with host and region, grouped per host
+    hostproduct_dict = {}
+    for product in products.filter(places_left__gt=0).select_related("host__region").order_by("id"):
+        hostproduct_dict.setdefault(product.host, []).append(product)
+
+    return [{"host": host, "products": products} for host, products in hostproduct_dict.items()]
+
+
 @router.get("/available/{selected_date}", response=List[AvailableProductsSchema], tags=["user-booking"])
 def list_available(request, selected_date: str):
     try:
@@ -38,24 +50,25 @@ def list_available(request, selected_date: str):
     except ValueError:
         raise HttpError(404, "Invalid date, dates need to be in the YYYY-MM-DD format")
 
-    # List of unavailable products
-    unavailable_products = Available.objects.filter(available_date=selected_date, places_left=0)
+    return group_available_products(Product.objects.with_places_left(selected_date))
 
-    # Get available products
-    available_products_list = Product.objects.exclude(id__in=unavailable_products.values('product_id'))
 
-    hostproduct_dict = {}
+@router.get("/available/{start_date}/{end_date}", response=List[AvailableProductsSchema], tags=["user-booking"])
+def list_available_range(request, start_date: str, end_date: str):
+    """
+    Products with places left every night from start_date up to end_date.
+    'places_left' is the lowest number of places left on any of the nights.
+    """
+    try:
+        start_date = models.DateField().to_python(start_date)
+        end_date = models.DateField().to_python(end_date)
+    except (ValueError, ValidationError):
+        raise HttpError(404, "Invalid date, dates need to be in the YYYY-MM-DD format")
 
-    for product in available_products_list: #create dict of available products sorted by host
-        available = Available.objects.filter(available_date=selected_date, product=product)
-        places_left = available.first().places_left if available.exists() else product.total_places
-        product.places_left = places_left
-        if product.host in hostproduct_dict:
-            hostproduct_dict[product.host].append(product)
-        else:
-            hostproduct_dict[product.host] = [product]
+    if end_date <= start_date:
+        raise HttpError(400, "end_date must be after start_date")
 
-    return [{"host": host, "products": products} for host, products in hostproduct_dict.items()]
+    return group_available_products(Product.objects.with_places_left(start_date, end_date))
 
 @router.get("/available_host/{host_id}", response=List[AvailableHostProductsSchema], tags=["user-booking"])
 def list_available_by_host(request, host_id: int):
@@ -126,7 +139,7 @@ def request_booking(request, booking_data: BookingPostSchema):
     booking.end_date = booking_data.end_date
     booking.product = product
     booking.user = user
-    booking.status = BookingStatus.objects.get(description="pending")
+    booking.status = BookingStatus.objects.get_state(State.PENDING)
     try:
         booking.save()
     except Exception as e:
@@ -138,14 +151,14 @@ def request_booking(request, booking_data: BookingPostSchema):
 
 def getBookings (user):
     client = Client.objects.get(user=user)
-    status_list = ['completed', 'checked_in']
+    status_list = [State.COMPLETED, State.CHECKED_IN]
     # List of bookings for the user
-    bookings = (Booking.objects.filter(
+    bookings = booking_schema_queryset(Booking.objects.filter(
         user=client
     ).exclude(
         end_date__lt=timezone.now().date()
     ).exclude(
-        status__description__in=status_list
+        status_id__in=status_list
     ).order_by('start_date'))
 
     return bookings
@@ -170,7 +183,7 @@ def confirm_booking(request, booking_id: int):
         raise HttpError(403, "You are not authorized to confirm this booking.")
 
     try:
-        booking.status = BookingStatus.objects.get(description='confirmed')
+        booking.status = BookingStatus.objects.get_state(State.CONFIRMED)
         booking.save()
         return getBookings(request.user)
     except BookingStatus.DoesNotExist:
@@ -1,4 +1,5 @@
-from ninja import Router
+from ninja import Router, Query
+from ninja.pagination import paginate
 from django.contrib.auth.models import User
 from ninja.errors import HttpError
 from django.db import models
@@ -7,7 +8,10 @@ from django.shortcuts import get_object_or_404
 from backend.models import Resource
 from .api_schemas import ResourceSchema
 from backend.auth import group_auth
-from django.db.models import Q
+from backend.search import fuzzy_search_clients
+from .pagination import CursorPagination
+from .streaming import stream_json_list
+from django.db.models import Q, F
 from django.db.models.functions import Lower
 from django.core.mail import send_mail
 import json
@@ -21,6 +25,7 @@ from backend.models import (
     Product,
     Booking,
     BookingStatus,
+    State,
     Available,
     User,
 )
@@ -33,9 +38,13 @@ from .api_schemas import (
     ClientSchema,
     VolunteerCreateClientPostSchema,
     SimplifiedClientSchema,
+    ClientMatchSchema,
 )
 router = Router(auth=lambda request: group_auth(request, "volunteer"))
 
+# Max number of guests returned by the guest search
+GUEST_SEARCH_LIMIT = 50
+
 
 
 # TODO: Test live email server setup to ensure delivery in production
@@ -143,7 +152,7 @@ def request_booking(request, booking_data: BookingPostSchema):
         end_date=booking_data.end_date,
         product=product,
         user=user,
-        status=BookingStatus.objects.get(description="pending")
+        status=BookingStatus.objects.get_state(State.PENDING)
     )
 
     try:
@@ -161,7 +170,7 @@ def confirm_booking(request, booking_id: int):
     booking = get_object_or_404(Booking, id=booking_id)
 
     # Ensure booking status allows for confirmation (if you want a condition)
-    if booking.status.description != "pending":
+    if booking.status_id != State.PENDING:
         raise HttpError(400, "Only pending bookings can be confirmed.")
 
     # Retrieve the user associated with the booking
@@ -169,7 +178,7 @@ def confirm_booking(request, booking_id: int):
     print(user.__dict__)
 
     # Update booking status to reflect confirmation
-    booking.status = BookingStatus.objects.get(description="confirmed")
+    booking.status = BookingStatus.objects.get_state(State.CONFIRMED)
 
     try:
         booking.save()
@@ -184,6 +193,34 @@ def confirm_booking(request, booking_id: int):
     return booking
 
 
+def guest_search_terms(first_name, last_name, uno):
+    """
+    Normalized search terms per search column on Client, normalized
+    the same way as the columns.
+    """
+    terms = {
+        "search_first_name": Client.search_value("search_first_name", first_name),
+        "search_last_name": Client.search_value("search_last_name", last_name),
+        "search_unokod": Client.search_value("search_unokod", str(uno) if uno else ""),
+    }
+    terms = {field: value for field, value in terms.items() if value}
+
+    # Check if all fields are empty
+    if not terms:
+        raise HttpError(400, "Either first name, last name or unocode must be provided for the search.")
+    return terms
+
+
+def guest_search_result(client):
+    return {
+        "id": client.id,
+        "first_name": client.first_name,
+        "last_name": client.last_name,
+        "unokod": client.unokod,
+        "region_name": client.region.name if client.region else None
+    }
+
+
 @router.get("/guest/search", response=List[SimplifiedClientSchema], tags=["Volunteer"])
 def search_guest(
     request,
@@ -191,70 +228,63 @@ def search_guest(
     last_name: Optional[str] = "",
     uno: Optional[str] = None,):
 
+    # Prefix match on the indexed search columns
+    condition = Q()
+    for field, value in guest_search_terms(first_name, last_name, uno).items():
+        condition |= Q(**{f"{field}__startswith": value})
 
-    # Normalize input by converting it to lowercase
-    search_first_name = first_name.strip().lower() if first_name else ""
-    search_last_name = last_name.strip().lower() if last_name else ""
-    search_unocode = str(uno).strip().lower() if uno else ""
-
-    # Debugging: Check what is being received
-    if uno is None:
-        print("WARNING: unocode is None before processing!")
-
-    # Check if both fields are empty
-    if not (search_first_name or search_last_name or search_unocode):
-        print("ERROR: All parameters are empty!")
-        raise HttpError(400, "Either first name, last name or unocode must be provided for the search.")
-
-
-    clients = Client.objects.all()
-
-    matching_clients = []
-
-    for client in clients:
-        # Normalize database values for comparison
-        client.first_name.strip().lower() if client.first_name else ""
-        client.last_name.strip().lower() if client.last_name else ""
-        db_unocode = str(client.unokod).strip().lower() if client.unokod else ""
+    clients = (
+        Client.objects.filter(condition)
+        .select_related("region")
+        .only("id", "first_name", "last_name", "unokod", "region__name")
+        .order_by("last_name", "first_name", "id")[:GUEST_SEARCH_LIMIT]
+    )
 
+    return [guest_search_result(client) for client in clients]
 
-        # check if the normalized first name matches the input
-        if(
-            (search_first_name and search_first_name == client.first_name.strip().lower()) or
-            (search_last_name and search_last_name == client.last_name.strip().lower()) or
-            (search_unocode and search_unocode == db_unocode)
-        ):
-            matching_clients.append(client)
 
+@router.get("/guest/search/fuzzy", response=List[ClientMatchSchema], tags=["Volunteer"])
+def fuzzy_search_guest(
+    request,
+    first_name: Optional[str] = "",
+    last_name: Optional[str] = "",
+    uno: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=GUEST_SEARCH_LIMIT),):
+    """
+    Guests ranked by how similar their names and unokod are to the search,
+    for misspelled names. Uses pg_trgm in PostgreSQL and an in-memory
+    trigram index otherwise.
+    """
+    clients = fuzzy_search_clients(guest_search_terms(first_name, last_name, uno), limit)
 
     return [
-        {
-            "id": client.id,
-            "first_name": client.first_name,
-            "last_name": client.last_name,
-            "unokod": client.unokod,
-            "region_name": client.region.name if client.region else None
-        }
-        for client in matching_clients
+        {**guest_search_result(client), "similarity": round(client.similarity, 3)}
+        for client in clients
     ]
 
 
 @router.get("/guest/list", response=List[SimplifiedClientSchema], tags=["Volunteer"])
+@paginate(CursorPagination)
 def list_guests(request):
-    # Fetch clients and include related fields for optimization
-    clients = Client.objects.select_related("region").all()
+    # Fetch clients with the region name in the same query
+    clients = Client.objects.annotate(region_name=F("region__name")).only(
+        "id", "first_name", "last_name", "unokod"
+    )
 
-    # Format response manually
-    return [
-        {
-            "id": client.id,
-            "first_name": client.first_name,
-            "last_name": client.last_name,
-            "unokod": client.unokod,
-            "region_name": client.region.name if client.region else None,  # Handle optional region
-        }
-        for client in clients
-    ]
+    return clients
+
+
+@router.get("/guest/export", tags=["Volunteer"])
+def export_guests(request):
+    """
+    All guests as one JSON array with the same fields as /guest/list,
+    streamed from the database for exports.
+    """
+    return stream_json_list(
+        Client.objects.order_by("id"),
+        "id", "first_name", "last_name", "unokod",
+        region_name=F("region__name"),
+    )
 
 
 @router.post("/guest/create", response=ClientSchema, tags=["Volunteer"])
@@ -329,29 +359,29 @@ def list_available(request, selected_date: str):
 """
 
 @router.get("/compass/", response=List[ResourceSchema], tags=["Volunteer"])
-def list_compass_resources(request):
+@paginate(CursorPagination)
+def list_compass_resources(
+    request,
+    search: Optional[str] = None,
+    target_group: List[str] = Query(None),
+    applies_to: List[str] = Query(None),
+    open_now: bool = False,
+):
     """
-    List Compass resources for volunteers.
+    List Compass resources for volunteers, optionally filtered on a search
+    text, target groups, problem areas (applies_to) and opening hours.
     """
-    resources = Resource.objects.all()
+    resources = Resource.objects.with_is_open()
+    if open_now:
+        resources = resources.filter(is_open=True)
+    if search:
+        resources = resources.search(search)
+    if target_group:
+        resources = resources.filter(target_group__in=target_group)
+    if applies_to:
+        resources = resources.applies_to_any(applies_to)
 
-    return [
-        ResourceSchema(
-            id=resource.id,
-            name=resource.name,
-            type=resource.type,
-            opening_time=resource.opening_time.strftime("%H:%M:%S"),
-            closing_time=resource.closing_time.strftime("%H:%M:%S"),
-            address=resource.address,
-            phone=resource.phone,
-            email=resource.email,
-            target_group=resource.target_group,
-            other=resource.other,
-            applies_to=resource.applies_to,
-            is_open_now=resource.is_open_now()
-        )
-        for resource in resources
-    ]
+    return resources
 
 
 
@@ -361,17 +391,4 @@ def list_compass_resources(request):
 @router.get("/compass/resources/{resource_id}", response=ResourceSchema, tags=["Volunteer"])
 def get_resource_by_id(request, resource_id: int):
     resource = get_object_or_404(Resource, id=resource_id)
-    return ResourceSchema(
-        id=resource.id,
-        name=resource.name,
-        type=resource.type,
-        opening_time=resource.opening_time.strftime("%H:%M:%S"),
-        closing_time=resource.closing_time.strftime("%H:%M:%S"),
-        address=resource.address,
-        phone=resource.phone,
-        email=resource.email,
-        target_group=resource.target_group,
-        other=resource.other,
-        applies_to=resource.applies_to,
-        is_open_now=resource.is_open_now()
-    )
+    return resource
@@ -24,6 +24,27 @@ DATABASES = {
     }
 }
 
+# PostgreSQL lookups, e.g. trigram_similar for fuzzy guest search
+INSTALLED_APPS += ["django.contrib.postgres"]
+
+# Cache shared by all uWSGI workers, e.g. for the users' groups in
+# backend/auth.py, which signals clear on change. Redis if REDIS_URL is
+# set, otherwise a database table (createcachetable, see scripts/run.sh).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'noq_cache',
+        }
+    }
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 